@@ -0,0 +1,55 @@
+#### Cold-start cost of each pipeline stage: wall time of importing the stage module in a fresh
+#### interpreter, and which heavy libraries that import pulls in.
+#### Run from the project root: python benchmarks/cold_start.py --repeat 5
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+
+STAGE_MODULES = {
+    'data_ingestion': 'src.pipeline.stage_01_data_ingestion',
+    'data_transformation': 'src.pipeline.stage_02_data_transformation',
+    'model_trainer': 'src.pipeline.stage_03_model_trainer',
+}
+HEAVY_MODULES = ['prophet', 'cmdstanpy', 'sqlalchemy', 'psycopg2', 'pyarrow']
+
+CHILD = '''
+import sys, time, json, os
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules],
+                  "log_dir_created": os.path.isdir("logs") and len(os.listdir("logs")) > {n_logs}}}))
+'''
+
+
+def measure(module, repeat):
+    import os
+    n_logs = len(os.listdir('logs')) if os.path.isdir('logs') else 0
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', CHILD.format(module=module, heavy=HEAVY_MODULES, n_logs=n_logs)], text=True)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {'median_seconds': statistics.median(run['seconds'] for run in runs),
+            'min_seconds': min(run['seconds'] for run in runs),
+            'loaded': runs[0]['loaded'],
+            'log_dir_created': runs[0]['log_dir_created']}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import-time cost of each pipeline stage")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for stage, module in STAGE_MODULES.items():
+        results[stage] = measure(module, args.repeat)
+        print(f"{stage:20s} {results[stage]['median_seconds']:.3f}s median (min {results[stage]['min_seconds']:.3f}s)  "
+              f"heavy imports: {', '.join(results[stage]['loaded']) or '-'}  log dir on import: {results[stage]['log_dir_created']}")
+
+    if args.json:
+        with open(args.json, 'w') as file_obj:
+            json.dump(results, file_obj, indent=2)
@@ -0,0 +1,133 @@
+#### Synthetic procurement exports with the schema of notebook/data/filtered_with_feb_with_stand_name.csv,
+#### item_name_mapping.csv and category_with_ID.csv
+#### Run from the project root: python benchmarks/generate_data.py --out-dir /tmp/synthetic --properties 10
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+
+UNITS = ['kilogram', 'piece/unit', 'packet', 'cardboard box', 'liter', 'bottle']
+VARIANTS = ['fresh', 'frozen', 'chilled', 'organic', 'imported', 'local', 'premium', 'catering']
+SIZES = ['1kg', '500g', '5kg', '10kg', '1L', '12pcs', '250g', '2kg']
+
+
+def generate_mapping(n_items=2000, n_standard_items=600, n_categories=26, n_extra_categories=2, remove_rate=0.07, seed=0):
+    '''
+    Category list and item-name mapping. Raw item names are variants of standard item names,
+    n_extra_categories categories are left out of the category list and a remove_rate share of
+    the raw items is flagged with Remove_flag = 1.
+    '''
+    rng = np.random.default_rng(seed)
+    category_ids = rng.choice(np.arange(10000, 99999), n_categories + n_extra_categories, replace=False)
+    category_names = np.array([f"LS - Category {i:02d}" for i in range(len(category_ids))], dtype=object)
+    category_df = pd.DataFrame({'Category': category_names[:n_categories], 'CategoryID': category_ids[:n_categories]})
+
+    standard_category = rng.integers(0, len(category_ids), n_standard_items)
+    standard_names = np.array([f"Standard item {j}" for j in range(n_standard_items)], dtype=object)
+
+    item_standard = rng.integers(0, n_standard_items, n_items)
+    raw_names = [f"{standard_names[s]}, {VARIANTS[rng.integers(len(VARIANTS))]}, {SIZES[rng.integers(len(SIZES))]}, ref {i}"
+                 for i, s in enumerate(item_standard)]
+    remove_flag = (rng.random(n_items) < remove_rate).astype(int)
+    mapping_df = pd.DataFrame({
+        'Item_Name': raw_names,
+        'Inventory_Unit': np.array(UNITS, dtype=object)[rng.integers(0, len(UNITS), n_items)],
+        'Category': category_names[standard_category[item_standard]],
+        'Unit_Standard': np.array(UNITS, dtype=object)[rng.integers(0, len(UNITS), n_items)],
+        'Category_Standard': category_names[standard_category[item_standard]],
+        'CategoryID_Standard': category_ids[standard_category[item_standard]],
+        'Item_Name_Standard': standard_names[item_standard],
+        'Remove_flag': remove_flag,
+        'Remarks': np.where(remove_flag == 1, 'Remove from the list', None),
+    })
+    return category_df, mapping_df
+
+
+def generate_export(mapping_df, n_properties=1, n_cost_centers=13, items_per_cost_center=150,
+                    start_date='2023-01-01', end_date='2023-09-30', density=0.1, churn_rate=0.3,
+                    unmapped_rate=0.01, messy_rate=0.05, seed=0):
+    '''
+    Transactions of every (property, cost center, raw item) series. Each series buys on a day with a
+    Beta-distributed probability of mean density (most series are sparse, a few buy almost daily),
+    a churn_rate share of the series stops early, unmapped_rate of the items are missing from the
+    mapping and messy_rate of the item names carry padding and upper case like the real export.
+    '''
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start_date, end_date, freq='D')
+    n_series = n_properties * n_cost_centers * items_per_cost_center
+
+    properties = np.array([f"PROPERTY {p:03d}" for p in range(n_properties)], dtype=object)
+    cost_centers = np.array([f"Cost center {c:02d}" for c in range(n_cost_centers)], dtype=object)
+    series_property = np.repeat(np.arange(n_properties), n_cost_centers * items_per_cost_center)
+    series_cost_center = np.tile(np.repeat(np.arange(n_cost_centers), items_per_cost_center), n_properties)
+    series_item = rng.integers(0, len(mapping_df), n_series)
+    item_names = mapping_df['Item_Name'].to_numpy(dtype=object)[series_item]
+    unmapped = rng.random(n_series) < unmapped_rate
+    item_names[unmapped] = [f"Unmapped item {i}" for i in np.flatnonzero(unmapped)]
+
+    # Sparse, skewed purchase frequencies; churned series stop somewhere in the span
+    alpha = 0.3
+    rates = rng.beta(alpha, alpha * (1 - density) / density, n_series)
+    active_days = np.where(rng.random(n_series) < churn_rate, rng.integers(1, len(days) + 1, n_series), len(days))
+    n_transactions = np.maximum(rng.binomial(active_days, rates), 1)
+
+    rows = np.repeat(np.arange(n_series), n_transactions)
+    day_offsets = (rng.random(len(rows)) * np.repeat(active_days, n_transactions)).astype(np.int64)
+    booking_dates = days[day_offsets]
+
+    names = item_names[rows]
+    messy = rng.random(len(rows)) < messy_rate
+    names[messy] = [f"  {name.upper()} " for name in names[messy]]
+
+    mapping_category = mapping_df['Category'].to_numpy(dtype=object)
+    mapping_category_id = mapping_df['CategoryID_Standard'].to_numpy()
+    return pd.DataFrame({
+        'Property name': properties[series_property[rows]],
+        'Booking Date': booking_dates.month.astype(str) + '/' + booking_dates.day.astype(str) + '/' + booking_dates.year.astype(str),
+        'Supplier name': np.array([f"Supplier {s}" for s in range(50)], dtype=object)[rng.integers(0, 50, len(rows))],
+        'Quantity': rng.integers(1, 50, len(rows)),
+        'Gross Amount': np.round(rng.lognormal(3.3, 1.2, len(rows)), 3),
+        'Category': mapping_category[series_item[rows]],
+        'CategoryID': mapping_category_id[series_item[rows]],
+        'Cost Center Name': cost_centers[series_cost_center[rows]],
+        'Item name': names,
+    })
+
+
+def write_dataset(out_dir, scale=1, seed=0, **export_kwargs):
+    #### Writes the three input files; scale multiplies the number of properties (and so rows and series)
+    os.makedirs(out_dir, exist_ok=True)
+    category_df, mapping_df = generate_mapping(seed=seed)
+    export_kwargs.setdefault('n_properties', 1)
+    export_kwargs['n_properties'] *= scale
+    export_df = generate_export(mapping_df, seed=seed, **export_kwargs)
+
+    paths = {
+        'property_data_path': os.path.join(out_dir, 'filtered_with_feb_with_stand_name.csv'),
+        'mapping_data_path': os.path.join(out_dir, 'item_name_mapping.csv'),
+        'category_source_path': os.path.join(out_dir, 'category_with_ID.csv'),
+    }
+    export_df.to_csv(paths['property_data_path'], index=False, encoding='latin1')
+    mapping_df.to_csv(paths['mapping_data_path'], index=False, encoding='latin1')
+    category_df.to_csv(paths['category_source_path'], index=False, encoding='latin1')
+    return paths, len(export_df)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic procurement export")
+    parser.add_argument('--out-dir', required=True)
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--properties', type=int, default=1)
+    parser.add_argument('--cost-centers', type=int, default=13)
+    parser.add_argument('--items-per-cost-center', type=int, default=150)
+    parser.add_argument('--start-date', default='2023-01-01')
+    parser.add_argument('--end-date', default='2023-09-30')
+    parser.add_argument('--density', type=float, default=0.1, help="mean share of days a series buys on")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths, n_rows = write_dataset(args.out_dir, scale=args.scale, seed=args.seed, n_properties=args.properties,
+                                  n_cost_centers=args.cost_centers, items_per_cost_center=args.items_per_cost_center,
+                                  start_date=args.start_date, end_date=args.end_date, density=args.density)
+    print(f"Wrote {n_rows} transactions to {paths['property_data_path']}")
@@ -0,0 +1,145 @@
+#### Times DataIngestion, DataTransformation and ModelTraining on synthetic exports at several scales
+#### and records the results per commit under benchmarks/results so runs can be compared.
+#### Run from the project root: python benchmarks/scale.py --scales 1 10 100 --max-series 50
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from generate_data import write_dataset
+from src.metrics import metrics
+from src.utils import ArtifactWriter
+from src.components.data_ingestion import DataIngestion
+from src.components.item_mapping import ItemMappingIndex
+from src.components.data_transformation import DataTransformation
+from src.components.model_trainer import ModelTraining
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return 'unknown'
+
+
+@contextmanager
+def profiled(enabled, prof_path):
+    #### cProfile a stage and dump the stats next to the results file
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(prof_path)
+        pstats.Stats(prof_path).sort_stats('cumulative').print_stats(15)
+
+
+def run_scale(scale, args, work_dir, run_name):
+    metrics.reset()
+    writer = ArtifactWriter(enabled=False)    #### keep the real artifacts untouched
+    paths, n_rows = write_dataset(os.path.join(work_dir, 'data'), scale=scale, seed=args.seed, density=args.density)
+    result = {'scale': scale, 'export_rows': n_rows}
+    prof_prefix = os.path.join(RESULTS_DIR, f"{run_name}_scale{scale}")
+
+    ingestion = DataIngestion(writer=writer)
+    for key, path in paths.items():
+        setattr(ingestion.ingestion_config, key, path)
+    ingestion.ingestion_config.source = dict(ingestion.ingestion_config.source, type='csv')
+    ingestion.ingestion_config.mapping_index_path = os.path.join(work_dir, 'item_mapping_index.pkl')
+    ingestion.ingestion_config.final_data_path = os.path.join(work_dir, 'final_data.csv')
+    ingestion.ingestion_config.chunked = args.chunked
+    ingestion.mapping_index = ItemMappingIndex(paths['mapping_data_path'], ingestion.ingestion_config.mapping_index_path)
+    with metrics.stage('ingestion'), profiled(args.profile, f"{prof_prefix}_ingestion.prof"):
+        final_data, _ = ingestion.initiate_data_ingestion()
+
+    transformation = DataTransformation(writer=writer)
+    with metrics.stage('transformation'), profiled(args.profile, f"{prof_prefix}_transformation.prof"):
+        _, weekly_df, _, max_date = transformation.data_preprocessor(final_data)
+    result['selected_series'] = int(weekly_df['uniqueID'].nunique())
+    result['weekly_rows'] = len(weekly_df)
+
+    if args.max_series:
+        trainer = ModelTraining(writer=writer)
+        config = trainer.model_training_config
+        config.n_jobs = args.n_jobs
+        config.use_forecast_cache = False
+        config.warm_start = False
+        config.series_store_dir = os.path.join(work_dir, 'series_store')
+        series_ids = weekly_df['uniqueID'].unique()[:args.max_series]
+        train_df = weekly_df[weekly_df['uniqueID'].isin(series_ids)][['uniqueID','Booking_Date','Gross_Amount']].copy()
+        train_df['uniqueID'] = train_df['uniqueID'].astype(str).astype('category')
+        with metrics.stage('training'), profiled(args.profile, f"{prof_prefix}_training.prof"):
+            trainer.run_model_for_all_ids(trainer.model_, train_df, max_date, model_name="Prophet_model")
+        result['trained_series'] = len(series_ids)
+
+    result.update(stages=metrics.stages, timers=metrics.timers, counters=metrics.counters, peak_rss_mb=metrics.process_peak_rss_mb())
+    fit_seconds = [record['fit_seconds'] for record in metrics.series if 'fit_seconds' in record]
+    if fit_seconds:
+        result['fit_seconds_per_series'] = sum(fit_seconds) / len(fit_seconds)
+    return result
+
+
+def compare(results, previous_path):
+    #### Stage wall times of this run next to a previous results file
+    with open(previous_path) as file_obj:
+        previous = {run['scale']: run for run in json.load(file_obj)['runs']}
+    rows = []
+    for run in results['runs']:
+        for stage, values in run['stages'].items():
+            before = previous.get(run['scale'], {}).get('stages', {}).get(stage, {}).get('seconds')
+            rows.append({'scale': run['scale'], 'stage': stage, 'seconds': round(values['seconds'], 3),
+                         'previous': None if before is None else round(before, 3),
+                         'ratio': None if not before else round(values['seconds'] / before, 2)})
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scale benchmark of the procurement forecast pipeline")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--max-series', type=int, default=20, help="series fitted per scale, 0 skips training")
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--density', type=float, default=0.1)
+    parser.add_argument('--chunked', action='store_true', help="use the streaming ingestion mode")
+    parser.add_argument('--profile', action='store_true', help="cProfile every stage into benchmarks/results")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help="previous results file to compare the stage times with")
+    args = parser.parse_args()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = git_commit()
+    run_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}"
+    results = {'commit': commit, 'python': platform.python_version(), 'pandas': pd.__version__,
+               'platform': platform.platform(), 'args': vars(args), 'runs': []}
+
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix=f"procurement_bench_{scale}x_") as work_dir:
+            start = time.perf_counter()
+            run = run_scale(scale, args, work_dir, run_name)
+            run['total_seconds'] = time.perf_counter() - start
+        results['runs'].append(run)
+        stage_times = ', '.join(f"{stage} {values['seconds']:.2f}s" for stage, values in run['stages'].items())
+        print(f"{scale}x: {run['export_rows']} rows, {run['selected_series']} series selected; {stage_times}; "
+              f"peak RSS {run['peak_rss_mb'] or float('nan'):.0f} MB", file=sys.stderr)
+
+    results_path = os.path.join(RESULTS_DIR, f"{run_name}.json")
+    with open(results_path, 'w') as file_obj:
+        json.dump(results, file_obj, indent=2, default=str)
+    print(f"Results written to {results_path}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,55 @@
+#### Throughput of the column-wise string cleaning against the per-cell applymap it replaced
+#### Run from the project root: python benchmarks/string_cleaning.py --rows 1000000
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src.utils import clean_string_columns
+
+
+def applymap_clean(df):
+    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    df['Item_Name'] = df['Item_Name'].str.lower()
+    return df
+
+
+def make_export(n_rows, seed=0):
+    #### Synthetic procurement export with padded strings, missing values and numeric columns
+    rng = np.random.default_rng(seed)
+    items = np.array([f"  Item {i} Fresh 1Kg " for i in range(5000)], dtype=object)
+    item_names = items[rng.integers(0, len(items), n_rows)]
+    item_names[rng.random(n_rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        'Property_name': np.array([' Hotel A', 'Hotel B ', ' Hotel C '], dtype=object)[rng.integers(0, 3, n_rows)],
+        'Booking_Date': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 700, n_rows), 'D'),
+        'Gross_Amount': rng.random(n_rows) * 100,
+        'Category': np.array(['LS - Dairy ', ' LS - Bakery'], dtype=object)[rng.integers(0, 2, n_rows)],
+        'CategoryID': rng.integers(20000, 30000, n_rows),
+        'Cost_Center_Name': np.array(['Kitchen ', ' Bar'], dtype=object)[rng.integers(0, 2, n_rows)],
+        'Item_Name': item_names,
+    })
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Column-wise string cleaning against the per-cell applymap")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_export(args.rows)
+    old_time, expected = best_of(applymap_clean, df, args.repeat)
+    new_time, result = best_of(lambda frame: clean_string_columns(frame, lower=['Item_Name']), df, args.repeat)
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"rows: {args.rows}")
+    print(f"applymap:             {old_time:.3f}s  {args.rows / old_time:,.0f} rows/s")
+    print(f"clean_string_columns: {new_time:.3f}s  {args.rows / new_time:,.0f} rows/s  ({old_time / new_time:.1f}x)")
@@ -1,41 +1,78 @@
 import sys
+import argparse
 from src.logger import logging
 from src.exception import CustomException
+from src.utils import ArtifactWriter
+from src.metrics import metrics
 from src.pipeline.stage_01_data_ingestion import DataIngestionPipeline
 from src.pipeline.stage_02_data_transformation import DataTransformationPipeline
 from src.pipeline.stage_03_model_trainer import ModelTrainingPipeline
 
 
-STAGE_NAME = "Data Ingestion stage"
+parser = argparse.ArgumentParser(description="Run the procurement forecast pipeline with the stages chained in memory")
+parser.add_argument("--no-persist", action="store_true", help="skip writing the stage artifacts to disk")
+args = parser.parse_args()
+
+#### Stage outputs are passed straight to the next stage; artifacts are written by a background writer thread
+writer = ArtifactWriter(background=True, enabled=not args.no_persist)
+
+
+#### One try/finally around all stages so a failed run still drains the writer and writes its metrics
+run_failed = True
 try:
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
-    data_ingestion = DataIngestionPipeline()
-    data_ingestion.main()
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
+    STAGE_NAME = "Data Ingestion stage"
+    try:
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
+        data_ingestion = DataIngestionPipeline(writer=writer)
+        with metrics.stage(STAGE_NAME):
+            final_data, category_data = data_ingestion.main()
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
 
-except CustomException as e:
-    raise CustomException(e,sys)
+    except CustomException as e:
+        raise CustomException(e,sys)
 
 
 
-STAGE_NAME = "Data Transformation stage"
-try:
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
-    data_transformation = DataTransformationPipeline()
-    data_transformation.main()
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
+    STAGE_NAME = "Data Transformation stage"
+    try:
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
+        data_transformation = DataTransformationPipeline(writer=writer)
+        with metrics.stage(STAGE_NAME):
+            selected_df_daily, selected_df_weekly, selected_df_monthly, max_date = data_transformation.main(final_data)
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
 
-except CustomException as e:
-    raise CustomException(e,sys)
+    except CustomException as e:
+        raise CustomException(e,sys)
 
 
 
-STAGE_NAME = "Model Training stage"
-try:
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
-    model_train = ModelTrainingPipeline()
-    model_train.main()
-    logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
+    STAGE_NAME = "Model Training stage"
+    try:
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
+        model_train = ModelTrainingPipeline(writer=writer)
+        with metrics.stage(STAGE_NAME):
+            model_train.main(selected_df_weekly, max_date)
+        logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
+
+    except CustomException as e:
+        raise CustomException(e,sys)
+
+    run_failed = False
 
-except CustomException as e:
-    raise CustomException(e,sys)
\ No newline at end of file
+finally:
+    try:
+        with metrics.stage("Artifact writes"):
+            writer.close()
+        logging.info("All pending artifact writes completed")
+    except Exception as e:
+        #### A failing write must not hide the exception of a failed stage
+        logging.error(f"Artifact writes failed: {e}")
+        if not run_failed:
+            raise
+    finally:
+        try:
+            #### Per-run timers, counters, per-series fit latencies and peak RSS as JSON and a Prometheus textfile
+            metrics_paths = metrics.write()
+            logging.info(f"Run metrics written to {metrics_paths}")
+        except Exception as e:
+            logging.error(f"Failed to write run metrics: {e}")
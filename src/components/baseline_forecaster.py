@@ -0,0 +1,103 @@
+import sys
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+
+
+class FourierBaselineForecaster:
+    '''
+    Linear trend plus yearly Fourier seasonality, fitted to many weekly series at once.
+    The design matrices of all series are stacked and the per-series normal equations
+    (X'X and X'y) are accumulated with bincount over the stacked rows, then solved in one
+    batched np.linalg.solve. As in Prophet, y is scaled by its maximum absolute value and the
+    yearly terms are only used for series with at least min_years_for_seasonality of history.
+    '''
+    def __init__(self, yearly_order=3, forecast_periods=52, freq='W', ridge=1e-6, min_years_for_seasonality=2.0):
+        self.yearly_order = yearly_order
+        self.forecast_periods = forecast_periods
+        self.freq = freq
+        self.ridge = ridge
+        self.min_years_for_seasonality = min_years_for_seasonality
+        self.positions = {}
+
+    @property
+    def n_features(self):
+        return 2 + 2 * self.yearly_order
+
+    def design_matrix(self, dates, start_dates, seasonal):
+        #### [1, t, sin/cos(2*pi*k*year fraction)]; t is in years since the series' first date
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        t = (dates - start_dates).astype('timedelta64[s]').astype(np.float64) / (365.25 * 86400)
+        X = np.empty((len(dates), self.n_features))
+        X[:, 0] = 1.0
+        X[:, 1] = t
+        years = dates.astype('datetime64[s]').astype(np.float64) / (365.25 * 86400)
+        for k in range(1, self.yearly_order + 1):
+            X[:, 2 * k] = np.sin(2 * np.pi * k * years) * seasonal
+            X[:, 2 * k + 1] = np.cos(2 * np.pi * k * years) * seasonal
+        return X
+
+    def fit(self, series, date_col='Booking_Date', value_col='Gross_Amount'):
+        try:
+            series = list(series)
+            self.positions = {unique_id: i for i, (unique_id, _) in enumerate(series)}
+            self.history_dates = [np.sort(df[date_col].to_numpy(dtype='datetime64[ns]')) for _, df in series]
+            n_series = len(series)
+            if n_series == 0:
+                self.coefficients = np.empty((0, self.n_features))
+                return self
+
+            lengths = np.array([len(df) for _, df in series])
+            codes = np.repeat(np.arange(n_series), lengths)
+            dates = np.concatenate([df[date_col].to_numpy(dtype='datetime64[ns]') for _, df in series])
+            y = np.concatenate([df[value_col].to_numpy(dtype=np.float64) for _, df in series])
+
+            self.start_dates = np.array([history[0] for history in self.history_dates], dtype='datetime64[ns]')
+            end_dates = np.array([history[-1] for history in self.history_dates], dtype='datetime64[ns]')
+            span_years = (end_dates - self.start_dates).astype('timedelta64[D]').astype(np.float64) / 365.25
+            self.seasonal = (span_years >= self.min_years_for_seasonality).astype(np.float64)
+            self.y_scale = np.maximum.reduceat(np.abs(y), np.cumsum(lengths) - lengths)
+            self.y_scale[self.y_scale == 0] = 1.0
+
+            X = self.design_matrix(dates, self.start_dates[codes], self.seasonal[codes])
+            y_scaled = y / self.y_scale[codes]
+
+            # Batched normal equations, one bincount per entry of the symmetric X'X and of X'y
+            p = self.n_features
+            XtX = np.empty((n_series, p, p))
+            for i in range(p):
+                for j in range(i, p):
+                    XtX[:, i, j] = XtX[:, j, i] = np.bincount(codes, weights=X[:, i] * X[:, j], minlength=n_series)
+            Xty = np.stack([np.bincount(codes, weights=X[:, i] * y_scaled, minlength=n_series) for i in range(p)], axis=1)
+
+            #### The ridge keeps short series and switched-off seasonal terms solvable
+            XtX += self.ridge * np.eye(p)
+            self.coefficients = np.linalg.solve(XtX, Xty[:, :, None])[:, :, 0]
+            logging.info(f"Fitted the Fourier baseline to {n_series} series ({len(y)} rows) in one batched solve")
+            return self
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def __contains__(self, unique_id):
+        return unique_id in self.positions
+
+    def future_dates(self, history_dates):
+        #### History plus forecast_periods dates after it, like Prophet's make_future_dataframe
+        last_date = pd.Timestamp(history_dates[-1])
+        dates = pd.date_range(start=last_date, periods=self.forecast_periods + 1, freq=self.freq)
+        dates = dates[dates > last_date][:self.forecast_periods]
+        return np.concatenate([np.unique(history_dates), dates.to_numpy(dtype='datetime64[ns]')])
+
+    def predict(self, unique_id):
+        #### DataFrame of ds and yhat over the series' history and forecast horizon
+        try:
+            i = self.positions[unique_id]
+            ds = self.future_dates(self.history_dates[i])
+            X = self.design_matrix(ds, self.start_dates[i], self.seasonal[i])
+            yhat = X @ self.coefficients[i] * self.y_scale[i]
+            return pd.DataFrame({'ds': pd.to_datetime(ds), 'yhat': yhat})
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -2,13 +2,13 @@ import os
 import sys
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import metrics
 import pandas as pd
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from src.utils import read_artifact_format, save_artifact, ArtifactWriter, ArtifactAppender, peak_rss_mb, clean_string_columns
+from src.utils import read_source_config, read_db_config
 
-from src.components.data_transformation import DataTransformation
-from src.components.data_transformation import DataTransformationConfig
-from src.components.model_trainer import ModelTraining
-from src.components.model_trainer import ModelTrainingConfig
+from src.components.item_mapping import ItemMappingIndex
 
 
 
@@ -16,60 +16,141 @@ from src.components.model_trainer import ModelTrainingConfig
 class DataIngestionConfig:
     final_data_path: str=os.path.join('artifacts/data_ingestion',"final_data.csv")
     category_data_path: str=os.path.join('artifacts/data_ingestion',"category_data.csv")
+    artifact_format: str=field(default_factory=read_artifact_format)
+    property_data_path: str=os.path.join('notebook/data',"filtered_with_feb_with_stand_name.csv")
+    category_source_path: str=os.path.join('notebook/data',"category_with_ID.csv")
+    mapping_data_path: str=os.path.join('notebook/data',"item_name_mapping.csv")
+    mapping_index_path: str=os.path.join('artifacts/data_ingestion',"item_mapping_index.pkl")    #### compiled mapping, rebuilt when the CSV changes
+    #### Streaming mode reads the export in bounded chunks and appends each processed chunk to the final_data artifact
+    chunked: bool=False
+    chunksize: int=None    #### rows per chunk; None sizes the chunks from max_memory_mb
+    max_memory_mb: int=512    #### memory budget for one raw chunk plus its processed copies
+    sample_rows: int=10000    #### rows read up front to estimate the in-memory size of a row
+    #### 'source' section of config.yaml: the CSV export, or a PostgreSQL table read with the filters pushed down
+    source: dict=field(default_factory=read_source_config)
+    db_config_path: str='config/config.yaml'
+
+
+PROPERTY_COLUMNS = {'Property name':'Property_name','Booking Date':'Booking_Date','Gross Amount':'Gross_Amount',
+                    'Category':'Category','CategoryID':'CategoryID','Cost Center Name':'Cost_Center_Name','Item name':'Item_Name'}
 
 
 class DataIngestion:
-    def __init__(self):
+    def __init__(self, writer=None):
         self.ingestion_config=DataIngestionConfig()
+        self.writer = writer or ArtifactWriter()
+        self.mapping_index = ItemMappingIndex(self.ingestion_config.mapping_data_path, self.ingestion_config.mapping_index_path)
+
+
+    def load_category_data(self):
+        category_df = pd.read_csv(self.ingestion_config.category_source_path,encoding = 'latin1')
+        category_df = clean_string_columns(category_df, as_str=['CategoryID'])
+        print('Category data shape',category_df.shape)
+        return category_df
+
+
+    def process_property_data(self, property_data, category_ids):
+        #### strip -> lowercase -> mapping join -> category filter; applied to the whole export or to one chunk of it
+        property_data = property_data.rename(columns=PROPERTY_COLUMNS)
+
+        # Remove leading and trailing whitespaces from all string columns and lowercase the item names
+        property_data = clean_string_columns(property_data, lower=['Item_Name'])
+
+        #### Keyed lookup against the compiled mapping (CategoryID_Standard is already a string there)
+        merged_property_data_df = self.mapping_index.map_items(property_data)
+        #### Get only 26 categories data
+        return merged_property_data_df[merged_property_data_df['CategoryID_Standard'].isin(category_ids)].reset_index(drop=True)
+
+
+    def property_data_batches(self, category_ids, chunksize):
+        #### Raw export rows in batches: CSV chunks, or server-side cursor batches of the filtered database query
+        config = self.ingestion_config
+        if config.source['type'] == 'postgres':
+            #### SQLAlchemy is only imported when the database source is used
+            from src.components.db_source import PostgresSource
+            source = PostgresSource(config.source['table'], db_url=read_db_config(config.db_config_path), batch_size=chunksize)
+            return source.read_batches(list(PROPERTY_COLUMNS), item_column='Item name',
+                                       item_names=self.mapping_index.items_in_categories(category_ids),
+                                       date_column='Booking Date', date_from=config.source['date_from'], date_to=config.source['date_to'])
+        return pd.read_csv(config.property_data_path, encoding='latin1', usecols=list(PROPERTY_COLUMNS), chunksize=chunksize)
+
+
+    def estimate_chunksize(self):
+        #### Size the chunks so one raw chunk and its processed copies (~3x) stay within max_memory_mb
+        config = self.ingestion_config
+        if config.chunksize:
+            return config.chunksize
+        if config.source['type'] == 'postgres':
+            return config.source['batch_size']
+        sample = pd.read_csv(config.property_data_path, encoding='latin1', usecols=list(PROPERTY_COLUMNS), nrows=config.sample_rows)
+        bytes_per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+        chunksize = int(config.max_memory_mb * 1024 * 1024 / (3 * bytes_per_row))
+        logging.info(f"Estimated {bytes_per_row:.0f} bytes per row, reading {chunksize} rows per chunk for a {config.max_memory_mb} MB budget")
+        return max(chunksize, 1000)
+
+
+    def stream_data_ingestion(self, category_ids):
+        #### Bounded-memory ingestion: returns the path of the final_data artifact written chunk by chunk
+        config = self.ingestion_config
+        chunksize = self.estimate_chunksize()
+        appender = ArtifactAppender(config.final_data_path, config.artifact_format)
+        n_input_rows = 0
+        peak_chunk_mb = 0.0
+        last_chunk = None
+
+        for i, chunk in enumerate(self.property_data_batches(category_ids, chunksize)):
+            n_input_rows += len(chunk)
+            peak_chunk_mb = max(peak_chunk_mb, chunk.memory_usage(deep=True).sum() / (1024 * 1024))
+            with metrics.timer('ingestion_process_chunk'):
+                last_chunk = self.process_property_data(chunk, category_ids)
+            metrics.increment('ingestion_rows_read', len(chunk))
+            if not last_chunk.empty:
+                appender.write(last_chunk)
+            logging.info(f"Ingested chunk {i}: {len(chunk)} rows read, {len(last_chunk)} rows kept")
+
+        if appender.n_rows == 0 and last_chunk is not None:
+            appender.write(last_chunk)
+        final_data_path = appender.close()
+
+        print("Procurement data rows:", n_input_rows)
+        print('Final data rows', appender.n_rows)
+        logging.info(f"Streamed {n_input_rows} rows in chunks of {chunksize}; largest raw chunk {peak_chunk_mb:.1f} MB, "
+                     f"budget {config.max_memory_mb} MB, peak RSS {peak_rss_mb() or float('nan'):.1f} MB")
+        return final_data_path
 
 
     def initiate_data_ingestion(self):
         logging.info("Entered the data ingestion method or component")
         try:
 
-            category_df = pd.read_csv('notebook/data/category_with_ID.csv',encoding = 'latin1')
-            category_df = category_df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-            category_df['CategoryID'] = category_df['CategoryID'].astype(str)
-            print('Category data shape',category_df.shape)
-
-            property_data = pd.read_csv('notebook/data/filtered_with_feb_with_stand_name.csv',encoding = 'latin1', 
-                        usecols=['Property name','Booking Date','Gross Amount','Category','CategoryID','Cost Center Name','Item name'])
-            property_data.rename(columns={'Property name':'Property_name','Booking Date':'Booking_Date','Gross Amount':'Gross_Amount',
-                                        'Category':'Category','CategoryID':'CategoryID','Cost Center Name':'Cost_Center_Name','Item name':'Item_Name'}, inplace=True)
-            
-            # Remove leading and trailing whitespaces from all values in all columns
-            property_data = property_data.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-            property_data['Item_Name'] = property_data['Item_Name'].str.lower()
-            print("Procurement data shape:",property_data.shape)
-
-            mapping_df = pd.read_csv('notebook/data/item_name_mapping.csv',encoding = 'latin1'
-                                        ,usecols=['Item_Name','Item_Name_Standard','Category_Standard','Remove_flag','CategoryID_Standard'])
-
-            mapping_df = mapping_df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-            # mapping_df['Category_Standard'] = mapping_df['Category_Standard'].str.lower()
-            mapping_df['Item_Name'] = mapping_df['Item_Name'].str.lower()
-            mapping_df['Item_Name_Standard'] = mapping_df['Item_Name_Standard'].str.lower()
-            mapping_df_ = mapping_df.drop_duplicates().reset_index(drop=True)
-            mapping_df_['Remove_flag'] = mapping_df_['Remove_flag'].astype(str)
-            mapping_df_ = mapping_df_[mapping_df_['Remove_flag']=='0']
-            print('Mapping data shape',mapping_df_.shape)
-            
-            merged_property_data_df = pd.merge(property_data, mapping_df_[['Item_Name','Category_Standard','Item_Name_Standard','CategoryID_Standard']], on=['Item_Name'], how='inner')
-            merged_property_data_df['CategoryID_Standard'] = merged_property_data_df['CategoryID_Standard'].astype(str)
-            #### Get only 26 categories data
-            final_data_set = merged_property_data_df[merged_property_data_df['CategoryID_Standard'].isin(category_df.CategoryID.tolist())].reset_index(drop=True)
-            print('Final data shape',final_data_set.shape)
+            category_df = self.load_category_data()
+            self.mapping_index.load()
+            category_ids = category_df.CategoryID.tolist()
+
+            if self.ingestion_config.chunked:
+                final_data_set = self.stream_data_ingestion(category_ids)
+            else:
+                if self.ingestion_config.source['type'] == 'postgres':
+                    #### The database already dropped unmapped items and rows outside the date window
+                    batches = self.property_data_batches(category_ids, self.ingestion_config.source['batch_size'])
+                    property_data = pd.concat(list(batches), ignore_index=True)
+                else:
+                    property_data = pd.read_csv(self.ingestion_config.property_data_path,encoding = 'latin1', usecols=list(PROPERTY_COLUMNS))
+                print("Procurement data shape:",property_data.shape)
+                metrics.increment('ingestion_rows_read', len(property_data))
+                with metrics.timer('ingestion_process'):
+                    final_data_set = self.process_property_data(property_data, category_ids)
+                print('Final data shape',final_data_set.shape)
+                self.writer.submit(save_artifact, final_data_set, self.ingestion_config.final_data_path, self.ingestion_config.artifact_format)
 
             logging.info('Read all dataset and prepared final data as dataframe to preform data tranformation')
 
-            os.makedirs(os.path.dirname(self.ingestion_config.final_data_path),exist_ok=True)
-
-            final_data_set.to_csv(self.ingestion_config.final_data_path,index=False,header=True,encoding='latin1')
-            category_df.to_csv(self.ingestion_config.category_data_path,index=False,header=True,encoding='latin1')
+            self.writer.submit(save_artifact, category_df, self.ingestion_config.category_data_path, self.ingestion_config.artifact_format)
 
             logging.info("Data ingestion completed")
             
             # return (self.ingestion_config.final_data_path,self.ingestion_config.category_data_path)
+            #### In chunked mode final_data_set is the artifact path, which data transformation reads directly
             return final_data_set,category_df
         
         except CustomException as e:
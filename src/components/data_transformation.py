@@ -1,14 +1,13 @@
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from src.exception import CustomException
-from src.utils import save_object,save_variable
+from src.utils import save_object,save_variable,load_object,read_artifact_format,read_incremental_mode,save_artifact,load_artifact,artifact_path,ArtifactWriter
 from src.logger import logging
+from src.metrics import metrics
 import os
 
 import numpy as np
 import pandas as pd
-from math import ceil
-import calendar
 
 
 @dataclass
@@ -20,65 +19,117 @@ class DataTransformationConfig:
     selected_df_weekly_path = os.path.join('artifacts/data_transformation', "weekly_data.csv")
     selected_df_monthly_path = os.path.join('artifacts/data_transformation', "monthly_data.csv")
     max_date_path = os.path.join('artifacts/data_transformation', 'my_max_date_variable.pkl')
+    selected_df_quarterly_path = os.path.join('artifacts/data_transformation', "quarterly_data.csv")
+    quarterly_resampling: bool = False    #### also write the quarterly roll-up of the daily data
+    artifact_format: str = field(default_factory=read_artifact_format)    #### csv | parquet | feather
+    series_fingerprints_path = os.path.join('artifacts/data_transformation', "series_fingerprints.csv")
+    incremental: bool = field(default_factory=read_incremental_mode)    #### only recompute uniqueIDs whose source rows changed since the last run
+    min_days: int = 11    #### uniqueIDs with fewer distinct booking days are not forecast
+    max_inactive_months: int = 4    #### nor those without a purchase in the last max_inactive_months months
 
 
 
 class DataTransformation:
-    def __init__(self):
+    def __init__(self, writer=None):
         self.data_transformation_config = DataTransformationConfig()
+        self.writer = writer or ArtifactWriter()
 
 
     def fill_missing_dates(self,df, unique_id_col, date_col,max_date_):
         try:
             # Convert 'Booking_Date' column to datetime if it's not already
-            df[date_col] = pd.to_datetime(df[date_col])
-
-            date_range = pd.date_range(start=df.Booking_Date.min(), end= max_date_+pd.offsets.MonthEnd(0), freq='D')
-
-            # Create a MultiIndex with all unique IDs and the generated date range
-            idx = pd.MultiIndex.from_product([df[unique_id_col].unique(), date_range], names=[unique_id_col, date_col])
-
-            # Reindex the DataFrame with the MultiIndex and fill missing values with zeros
-            filled_df = df.set_index([unique_id_col, date_col]).reindex(idx, fill_value=0).reset_index()
+            dates = pd.to_datetime(df[date_col]).values.astype('datetime64[D]')
+            ids = df[unique_id_col]
+
+            #### Every uniqueID gets its own daily range, from its first date to the month end of max_date
+            end_date = np.datetime64((max_date_ + pd.offsets.MonthEnd(0)).date(), 'D')
+            id_codes, unique_ids = pd.factorize(ids)
+            start_dates = np.full(len(unique_ids), end_date)
+            np.minimum.at(start_dates, id_codes, dates)
+            lengths = (end_date - start_dates).astype(np.int64) + 1
+            id_offsets = np.cumsum(lengths) - lengths
+            total_rows = int(lengths.sum())
+
+            # Build the dense (uniqueID, date) grid for all IDs in one go
+            day_in_range = np.arange(total_rows) - np.repeat(id_offsets, lengths)
+            filled_df = pd.DataFrame({
+                unique_id_col: unique_ids.take(np.repeat(np.arange(len(unique_ids)), lengths)).values,
+                date_col: (np.repeat(start_dates, lengths) + day_in_range).astype('datetime64[ns]'),
+            })
+
+            # Scatter the existing rows into the grid and fill missing values with zeros
+            positions = id_offsets[id_codes] + (dates - start_dates[id_codes]).astype(np.int64)
+            for col in df.columns:
+                if col in (unique_id_col, date_col):
+                    continue
+                values = df[col].to_numpy()
+                if values.dtype.kind in 'iufc':
+                    filled_values = np.zeros(total_rows, dtype=values.dtype)
+                else:
+                    filled_values = np.full(total_rows, 0, dtype=object)
+                filled_values[positions] = values
+                filled_df[col] = filled_values
 
             return filled_df
         except CustomException as e:
             raise CustomException(e,sys)
         
 
+    def series_statistics(self, df):
+        '''
+        Per-uniqueID eligibility statistics in one sorted pass over integer date numbers:
+        distinct booking dates, ISO weeks and months, the last transaction date and the whole months
+        between it and the latest transaction date of all series.
+        '''
+        try:
+            codes, unique_ids = pd.factorize(df['uniqueID'], sort=True)
+            timestamps = df['Booking_Date'].to_numpy().astype('datetime64[ns]')
+            dates = timestamps.astype('datetime64[D]')
+            days = dates.astype(np.int64)
+            #### 1970-01-01 was a Thursday, so (days + 3) // 7 numbers the Monday-based (ISO) weeks
+            weeks = (days + 3) // 7
+            months = dates.astype('datetime64[M]').astype(np.int64)
+
+            # Within a uniqueID sorted by date the day, week and month numbers only ever step up,
+            # so the distinct counts are the number of steps
+            order = np.lexsort((timestamps, codes))
+            codes, timestamps, weeks, months = codes[order], timestamps[order], weeks[order], months[order]
+            new_id = np.r_[True, codes[1:] != codes[:-1]]
+            n_ids = len(unique_ids)
+
+            def distinct_count(values):
+                changed = new_id | np.r_[True, values[1:] != values[:-1]]
+                return np.bincount(codes[changed], minlength=n_ids)
+
+            last_row = np.r_[new_id[1:], True]
+            last_months = months[last_row]
+
+            return pd.DataFrame({
+                'uniqueID': unique_ids,
+                'no_of_days': distinct_count(timestamps),
+                'no_of_weeks': distinct_count(weeks),
+                'no_of_months': distinct_count(months),
+                'last_Trx_Date': timestamps[last_row],
+                'months_difference': last_months.max(initial=0) - last_months,
+            })
+
+        except Exception as e:
+            raise CustomException(e,sys)
+
+
     def get_days_week_month_count(self,df):
         try:
-            # Add a new column 'Year'
-            df['Year'] = df['Booking_Date'].dt.isocalendar().year
-            # Add a new column 'Week of Year'
-            df['Week_of_Year'] = df['Booking_Date'].dt.isocalendar().week
-
-            df['week_year'] = df['Year'].astype(str) + '-' + df['Week_of_Year'].astype(str)
-
-            # Group the original dataframe by 'Unique ID'
-            grouped_df = df.groupby(['uniqueID']).agg(
-                no_of_days=('Booking_Date', 'nunique'),  # Count the number of unique booking dates
-                no_of_weeks=('week_year', 'nunique'),
-                no_of_months=('Booking_Date', lambda x: x.dt.to_period('M').nunique()),
-                last_Trx_Date = ('Booking_Date', 'max')).reset_index()
-            
-            grouped_df['lastest_date'] = grouped_df.last_Trx_Date.max()
-            grouped_df['months_difference'] = (grouped_df['lastest_date'].dt.to_period('M') - grouped_df['last_Trx_Date'].dt.to_period('M'))
-            grouped_df['months_difference'] = grouped_df['months_difference'].apply(lambda x: x.n)
-            
-            #### Filter uniqueIDs which has more week numbers
-            grouped_df_more_week_df = grouped_df[~((grouped_df['no_of_days'] < 11) | (grouped_df['months_difference'] >= 4))]
-            more_week_count_list_ = grouped_df_more_week_df.uniqueID.tolist()
-            print('Selected Unique IDs count: ',len(more_week_count_list_))
-            # print('Selected Unique IDs: ',more_week_count_list_)
+            grouped_df = self.series_statistics(df)
+            config = self.data_transformation_config
 
+            #### Keep uniqueIDs with at least min_days booking days and a purchase within the last max_inactive_months months
+            eligible = (grouped_df['no_of_days'] >= config.min_days) & (grouped_df['months_difference'] < config.max_inactive_months)
 
-            #### Filter uniqueIDs which has less week numbers
-            grouped_df_less_week_df = grouped_df[(grouped_df['no_of_days']< 11) | (grouped_df['months_difference']>= 4)]  #### filter less than or equal 10 records and last 4 month does not happend any purchase
-            less_count_unique_ids_list = grouped_df_less_week_df.uniqueID.tolist()
+            more_week_count_list_ = grouped_df.loc[eligible, 'uniqueID'].tolist()
+            print('Selected Unique IDs count: ',len(more_week_count_list_))
 
+            less_count_unique_ids_list = grouped_df.loc[~eligible, 'uniqueID'].tolist()
             print('Unselected Unique IDs count: ',len(less_count_unique_ids_list))
-            # print('Unselected Unique IDs: ',less_count_unique_ids_list)
 
             return more_week_count_list_, less_count_unique_ids_list
         
@@ -86,50 +137,62 @@ class DataTransformation:
             raise CustomException(e,sys)
         
 
+    def calendar_table(self,start_date,end_date):
+        try:
+            #### One row per calendar day between start_date and end_date, built once for the whole date span
+            dates = pd.date_range(start=start_date, end=end_date, freq='D')
+            first_day = dates - pd.to_timedelta(dates.day - 1, unit='D')
+            last_day = dates + pd.offsets.MonthEnd(0)
+            calendar_df = pd.DataFrame({
+                'Year': dates.year,
+                'Month': dates.month,
+                # Week of month: weeks start on Monday, the first (partial) week of the month is week 1
+                'Week_Number': (dates.day + first_day.weekday + 6) // 7,
+                # Months that do not end on a Sunday merge their trailing partial week into the week before
+                'Month_Ends_Sunday': last_day.weekday == 6,
+                'First_Sunday': first_day + pd.to_timedelta(6 - first_day.weekday, unit='D'),
+            }, index=dates)
+            return calendar_df
+
+        except CustomException as e:
+            raise CustomException(e,sys)
+
+
     def weekly_resampling(self,df):
         try:
-            sunday_dates = []
-            def week_of_month(dt):
-                first_day = dt.replace(day=1)
-                dom = dt.day
-                adjusted_dom = dom + first_day.weekday()
-                return int(ceil(adjusted_dom/7.0))
-            
-            def calculate_sunday_date(year, month, week_number):
-                first_day_of_month = pd.Timestamp(year, month, 1)
-                first_day_of_month_weekday = first_day_of_month.dayofweek
-                days_to_sunday = 6 - first_day_of_month_weekday
-                first_sunday_of_month = first_day_of_month + pd.Timedelta(days=days_to_sunday)
-                sunday_date = first_sunday_of_month + pd.Timedelta(weeks=week_number - 1)
-                return sunday_date
-            
-            df['Year'] = df['Booking_Date'].dt.year
-            df['Month'] = df['Booking_Date'].dt.month
-            df['Week_Number'] = df['Booking_Date'].apply(lambda x: week_of_month(x))
-            df_weekly = df.groupby(['uniqueID', 'Year', 'Month', 'Week_Number']).agg({'Gross_Amount': 'sum'}).reset_index()
-            grouped = df_weekly.groupby(['uniqueID', 'Year', 'Month'])
-            for name, group in grouped:
-                last_two_weeks = group.tail(2)
-                last_day_of_month = calendar.monthrange(name[1], name[2])[1]
-                weekday_of_last_day = calendar.weekday(name[1], name[2], last_day_of_month)
-        
-                if weekday_of_last_day == 6:
-                    continue
-                else:
-                    sum_last_two_weeks = last_two_weeks['Gross_Amount'].sum()
-                    min_week_number = min(last_two_weeks['Week_Number'])
-                    df_weekly.loc[last_two_weeks.index, 'Gross_Amount'] = sum_last_two_weeks
-                    df_weekly.loc[last_two_weeks.index, 'Week_Number'] = min_week_number
-            df_weekly = df_weekly.drop_duplicates()
-            
-            for index, row in df_weekly.iterrows():
-                sunday_date = calculate_sunday_date(row['Year'], row['Month'], row['Week_Number'])
-                sunday_dates.append(sunday_date)
-        
-            df_weekly['Sunday_Date'] = sunday_dates
-            columns_to_select = ['uniqueID', 'Sunday_Date', 'Gross_Amount']
-            df_weekly = df_weekly[columns_to_select].copy()
-            df_weekly = df_weekly.rename(columns={'Sunday_Date':'Booking_Date'}) 
+            dates = pd.to_datetime(df['Booking_Date']).values.astype('datetime64[D]')
+            calendar_df = self.calendar_table(dates.min(), dates.max())
+            calendar_pos = (dates - dates.min()).astype(np.int64)
+
+            # Integer series codes keep the uniqueIDs in order of appearance
+            id_codes, unique_ids = pd.factorize(df['uniqueID'])
+            daily = pd.DataFrame({
+                'id_code': id_codes,
+                'Year': calendar_df['Year'].to_numpy()[calendar_pos],
+                'Month': calendar_df['Month'].to_numpy()[calendar_pos],
+                'Week_Number': calendar_df['Week_Number'].to_numpy()[calendar_pos],
+                'Month_Ends_Sunday': calendar_df['Month_Ends_Sunday'].to_numpy()[calendar_pos],
+                'First_Sunday': calendar_df['First_Sunday'].to_numpy()[calendar_pos],
+                'Gross_Amount': df['Gross_Amount'].to_numpy(),
+            })
+            df_weekly = daily.groupby(['id_code', 'Year', 'Month', 'Week_Number']).agg(
+                Gross_Amount=('Gross_Amount', 'sum'),
+                Month_Ends_Sunday=('Month_Ends_Sunday', 'first'),
+                First_Sunday=('First_Sunday', 'first')).reset_index()
+
+            #### Merge the last two weeks of every month that does not end on a Sunday
+            month_keys = ['id_code', 'Year', 'Month']
+            in_last_two = df_weekly.groupby(month_keys).cumcount(ascending=False) < 2
+            merge_mask = in_last_two & ~df_weekly['Month_Ends_Sunday']
+            merged_week = df_weekly['Week_Number'].where(merge_mask).groupby([df_weekly[k] for k in month_keys]).transform('min')
+            df_weekly['Week_Number'] = merged_week.where(merge_mask, df_weekly['Week_Number']).astype(df_weekly['Week_Number'].dtype)
+            df_weekly = df_weekly.groupby(['id_code', 'Year', 'Month', 'Week_Number']).agg(
+                Gross_Amount=('Gross_Amount', 'sum'),
+                First_Sunday=('First_Sunday', 'first')).reset_index()
+
+            #### Each week is labelled with its Sunday date
+            df_weekly['Booking_Date'] = df_weekly['First_Sunday'] + pd.to_timedelta(7 * (df_weekly['Week_Number'] - 1), unit='D')
+            df_weekly['uniqueID'] = unique_ids.take(df_weekly['id_code'].to_numpy()).values
 
             #### Select wanted columns only 
             selected_colm = ['uniqueID','Booking_Date','Gross_Amount'] 
@@ -142,11 +205,115 @@ class DataTransformation:
         
 
 
+    def build_unique_id(self,df,columns,separator='__'):
+        try:
+            #### Factorize the key columns first so the joined string is built once per series, not once per row
+            key_codes, key_uniques = pd.MultiIndex.from_frame(df[columns].astype(str)).factorize()
+            key_strings = pd.Index([separator.join(key) for key in key_uniques])
+
+            # Integer series IDs over the sorted keys, stored as a categorical; different column
+            # combinations that join to the same string share one ID, as with the plain string key
+            categories = key_strings.unique().sort_values()
+            series_codes = categories.get_indexer(key_strings)[key_codes]
+            return pd.Categorical.from_codes(series_codes, categories=categories)
+
+        except CustomException as e:
+            raise CustomException(e,sys)
+
+
+    def resample(self,df,freq='ME',unique_id_col='uniqueID',date_col='Booking_Date'):
+        try:
+            #### Aggregate every uniqueID to the given frequency ('ME' monthly, 'QE' quarterly, ...) in one grouped pass
+            resampled_df = df.groupby([unique_id_col, pd.Grouper(key=date_col, freq=freq)], observed=True).sum().reset_index()
+            return resampled_df
+
+        except CustomException as e:
+            raise CustomException(e,sys)
+
+
+    def series_fingerprints(self,df):
+        try:
+            #### Order-independent content hash of each uniqueID's (Booking_Date, Gross_Amount) rows
+            row_hashes = pd.util.hash_pandas_object(df[['Booking_Date','Gross_Amount']], index=False).to_numpy()
+            id_codes, unique_ids = pd.factorize(df['uniqueID'])
+            fingerprints = np.zeros(len(unique_ids), dtype=np.uint64)
+            np.add.at(fingerprints, id_codes, row_hashes)
+            return pd.DataFrame({
+                'uniqueID': np.asarray(unique_ids, dtype=object),
+                'fingerprint': fingerprints.view(np.int64),
+                'n_rows': np.bincount(id_codes, minlength=len(unique_ids)),
+            })
+
+        except CustomException as e:
+            raise CustomException(e,sys)
+
+
+    def incremental_preprocess(self,dff,fingerprints,max_date,sub_pre):
+        try:
+            config = self.data_transformation_config
+            artifact_format = config.artifact_format
+            previous_paths = [artifact_path(path, artifact_format) for path in (config.series_fingerprints_path, config.selected_df_daily_path,
+                                                                                 config.selected_df_weekly_path, config.selected_df_monthly_path)]
+            if not all(os.path.exists(path) for path in previous_paths + [config.max_date_path]):
+                logging.info("No previous transformation artifacts found, running the full transformation")
+                return sub_pre(dff)
+
+            previous_max_date = load_object(config.max_date_path)
+            if max_date < previous_max_date:
+                logging.info(f"Max date moved back from {previous_max_date} to {max_date}, running the full transformation")
+                return sub_pre(dff)
+
+            #### A series can be reused when its rows are unchanged and it was already selected last run
+            previous_fingerprints = load_artifact(config.series_fingerprints_path, artifact_format)
+            compared = fingerprints.merge(previous_fingerprints, on='uniqueID', how='inner', suffixes=('', '_previous'))
+            unchanged_mask = ((compared['fingerprint'] == compared['fingerprint_previous'])
+                              & (compared['n_rows'] == compared['n_rows_previous'])
+                              & compared['selected_previous'].astype(bool)
+                              & compared['selected'].astype(bool))
+            unchanged_ids = compared.loc[unchanged_mask, 'uniqueID'].tolist()
+            changed_df = dff[~dff['uniqueID'].isin(unchanged_ids)]
+            logging.info(f"Incremental transformation: {changed_df['uniqueID'].nunique()} changed or new uniqueIDs, {len(unchanged_ids)} reused")
+
+            outputs = [[], [], []]
+            if len(changed_df):
+                for output, frame in zip(outputs, sub_pre(changed_df)):
+                    output.append(frame)
+
+            if unchanged_ids:
+                for output, path in zip(outputs, (config.selected_df_daily_path, config.selected_df_weekly_path, config.selected_df_monthly_path)):
+                    previous_df = load_artifact(path, artifact_format, unique_ids=unchanged_ids)
+                    previous_df['Booking_Date'] = pd.to_datetime(previous_df['Booking_Date'])
+                    output.append(previous_df)
+
+                #### Reused series were filled up to the previous month end; extend them with zeros up to the new one
+                if max_date > previous_max_date:
+                    extension_df = pd.DataFrame({'uniqueID': unchanged_ids,
+                                                 'Booking_Date': previous_max_date + pd.Timedelta(days=1),
+                                                 'Gross_Amount': 0.0})
+                    for output, frame in zip(outputs, sub_pre(extension_df)):
+                        output.append(frame)
+
+            categories = dff['uniqueID'].cat.categories
+            spliced = []
+            for output in outputs:
+                frame = pd.concat(output, ignore_index=True)
+                frame['uniqueID'] = pd.Categorical(frame['uniqueID'].astype(str), categories=categories)
+                spliced.append(frame.sort_values(['uniqueID','Booking_Date'], kind='stable').reset_index(drop=True))
+            return tuple(spliced)
+
+        except CustomException as e:
+            raise CustomException(e,sys)
+
+
     def data_preprocessor(self,final_data_path,encoding='latin1'):
         try:
             logging.info("Initiating data transformation")
 
-            df = pd.read_csv(final_data_path,encoding=encoding)
+            #### final_data_path is either the ingestion artifact path or the ingestion DataFrame itself
+            if isinstance(final_data_path, pd.DataFrame):
+                df = final_data_path.copy()
+            else:
+                df = load_artifact(final_data_path, self.data_transformation_config.artifact_format, encoding=encoding)
 
             df['Booking_Date'] = pd.to_datetime(df['Booking_Date'])
             max_date = df.Booking_Date.max() +  pd.offsets.MonthEnd(0)
@@ -155,7 +322,7 @@ class DataTransformation:
             ### Create the uniqueID
             separator = '__'
             columns_to_concat = ['Property_name', 'Cost_Center_Name','Category_Standard', 'Item_Name_Standard']
-            df['uniqueID'] = df[columns_to_concat].astype(str).apply(lambda x: x.str.cat(sep=separator), axis=1)
+            df['uniqueID'] = self.build_unique_id(df, columns_to_concat, separator)
             logging.info("Sucessfully created UniqueID")
 
             #### Sort the data frame
@@ -166,13 +333,16 @@ class DataTransformation:
             selected_colm_df = df[select_columns]
             
             #### Groping the dataset by 'uniqueID','Booking_Date'
-            selected_grouped_df = selected_colm_df.groupby(['uniqueID','Booking_Date'])['Gross_Amount'].sum().reset_index()
+            selected_grouped_df = selected_colm_df.groupby(['uniqueID','Booking_Date'], observed=True)['Gross_Amount'].sum().reset_index()
             logging.info("Successfully aggregated same-day transactions by unique ID")
 
             #### Filter only have more week numbers
-            selected_grouped_df1 = selected_grouped_df.copy()
-            more_week_count_list_, less_week_count_list_ = self.get_days_week_month_count(selected_grouped_df1)
+            with metrics.timer('eligibility_statistics'):
+                more_week_count_list_, less_week_count_list_ = self.get_days_week_month_count(selected_grouped_df)
+            metrics.increment('series_selected', len(more_week_count_list_))
+            metrics.increment('series_unselected', len(less_week_count_list_))
             selected_filtered_df = selected_grouped_df[selected_grouped_df['uniqueID'].isin(more_week_count_list_)].reset_index(drop=True)
+            selected_filtered_df['uniqueID'] = selected_filtered_df['uniqueID'].cat.remove_unused_categories()
 
             sel_unique_ids = selected_filtered_df['uniqueID'].unique()
             print('Selected final uniqueIDs to perform forecast: ',len(sel_unique_ids))
@@ -180,7 +350,7 @@ class DataTransformation:
 
         
             ### Write unselected unique IDs to a text file
-            save_object(
+            self.writer.submit(save_object,
                         file_path =self.data_transformation_config.selected_uniqueIDs_path,
                         unique_ids_ = sel_unique_ids
                         )
@@ -191,7 +361,7 @@ class DataTransformation:
             print('Unselected uniqueIDs counts: ',len(unsel_unique_ids))
             logging.info(f"Successfully filtered the uniqueIDs if have fewer days. Unselected unqiue IDs count: {len(unsel_unique_ids)}")
 
-            save_object(
+            self.writer.submit(save_object,
                         file_path =self.data_transformation_config.unselected_uniqueIDs_path,
                         unique_ids_ = unsel_unique_ids
                         )
@@ -199,13 +369,8 @@ class DataTransformation:
             def sub_pre(dff):
                 ### Fill missing sequence with zero
                 try:
-                    filled_data = []
-                    for unique_id in dff['uniqueID'].unique():
-                        subset = dff[dff['uniqueID'] == unique_id]  ### Get each uniqueIDs in loop
-                        filled_subset = self.fill_missing_dates(subset, unique_id_col='uniqueID', date_col='Booking_Date', max_date_ = max_date)
-                        filled_data.append(filled_subset)
-                    
-                    filled_missing_df = pd.concat(filled_data) # Concatenate the filled sequence subsets
+                    with metrics.timer('fill_missing_dates'):
+                        filled_missing_df = self.fill_missing_dates(dff, unique_id_col='uniqueID', date_col='Booking_Date', max_date_ = max_date)
                     logging.info("Successfully filled the missing sequence date.")
 
                 except CustomException as e:
@@ -214,12 +379,8 @@ class DataTransformation:
 
                 try:
                     #### Resampled by monthly
-                    month_resampled_data = []
-                    for unique_id in filled_missing_df['uniqueID'].unique():
-                        mon_subset = filled_missing_df[filled_missing_df['uniqueID'] == unique_id]
-                        monthly_resampled_ = mon_subset.groupby(['uniqueID', pd.Grouper(key='Booking_Date', freq='ME')]).sum().reset_index()
-                        month_resampled_data.append(monthly_resampled_)
-                    monthly_resampling_df = pd.concat(month_resampled_data) # Concatenate the filled subsets
+                    with metrics.timer('monthly_resample'):
+                        monthly_resampling_df = self.resample(filled_missing_df, freq='ME')
                     logging.info("Successfully daily dataset has been resampled into monthly.")
                 except CustomException as e:
                         raise CustomException(e,sys)
@@ -227,13 +388,8 @@ class DataTransformation:
 
                 ##### Resampled by weekly
                 try:
-                    weekly_filled_data = []
-                    for unique_id_ in filled_missing_df['uniqueID'].unique():
-                        week_subset = filled_missing_df[filled_missing_df['uniqueID'] == unique_id_]  ### Get each uniqueIDs in loop
-                        filled_week_subset = self.weekly_resampling(week_subset)
-                        weekly_filled_data.append(filled_week_subset)
-                    
-                    weekly_resampling_df = pd.concat(weekly_filled_data) # Concatenate the filled subsets
+                    with metrics.timer('weekly_resample'):
+                        weekly_resampling_df = self.weekly_resampling(filled_missing_df)
                     logging.info("Successfully resampled each unique ids in weekly.")
                 except CustomException as e:
                         raise CustomException(e,sys)
@@ -241,16 +397,29 @@ class DataTransformation:
                 return filled_missing_df, weekly_resampling_df, monthly_resampling_df  
 
       
-            selected_df_daily,selected_df_weekly,selected_df_monthly = sub_pre(selected_filtered_df)
+            #### Per-series fingerprints let the next run reprocess only the uniqueIDs whose rows changed
+            fingerprints = self.series_fingerprints(selected_grouped_df)
+            fingerprints['selected'] = fingerprints['uniqueID'].isin(sel_unique_ids)
+
+            if self.data_transformation_config.incremental:
+                selected_df_daily,selected_df_weekly,selected_df_monthly = self.incremental_preprocess(selected_filtered_df, fingerprints, max_date, sub_pre)
+            else:
+                selected_df_daily,selected_df_weekly,selected_df_monthly = sub_pre(selected_filtered_df)
             logging.info("Successfully saved selected daily, week and monthly resampled dataset into selected_df_daily,selected_df_weekly,selected_df_monthly variabels.")
 
-            os.makedirs(os.path.dirname(self.data_transformation_config.selected_df_daily_path),exist_ok=True)
+            artifact_format = self.data_transformation_config.artifact_format
+            self.writer.submit(save_artifact, selected_df_daily, self.data_transformation_config.selected_df_daily_path, artifact_format)
+            self.writer.submit(save_artifact, selected_df_weekly, self.data_transformation_config.selected_df_weekly_path, artifact_format)
+            self.writer.submit(save_artifact, selected_df_monthly, self.data_transformation_config.selected_df_monthly_path, artifact_format)
+            self.writer.submit(save_artifact, fingerprints, self.data_transformation_config.series_fingerprints_path, artifact_format)
 
-            selected_df_daily.to_csv(self.data_transformation_config.selected_df_daily_path,index=False,header=True,encoding='latin1')
-            selected_df_weekly.to_csv(self.data_transformation_config.selected_df_weekly_path,index=False,header=True,encoding='latin1')
-            selected_df_monthly.to_csv(self.data_transformation_config.selected_df_monthly_path,index=False,header=True,encoding='latin1')
+            if self.data_transformation_config.quarterly_resampling:
+                with metrics.timer('quarterly_resample'):
+                    selected_df_quarterly = self.resample(selected_df_daily, freq='QE')
+                self.writer.submit(save_artifact, selected_df_quarterly, self.data_transformation_config.selected_df_quarterly_path, artifact_format)
+                logging.info("Successfully daily dataset has been resampled into quarterly.")
 
-            save_variable(
+            self.writer.submit(save_variable,
                 file_path = self.data_transformation_config.max_date_path,
                 my_variable = max_date
             )
@@ -0,0 +1,60 @@
+import sys
+import pandas as pd
+from sqlalchemy import text
+from src.exception import CustomException
+from src.logger import logging
+from src.components.db_writer import get_engine
+
+
+#### Every character str.strip() removes, so btrim() in the query strips the same way
+WHITESPACE = ''.join(chr(code) for code in range(sys.maxunicode + 1) if chr(code).isspace())
+
+
+class PostgresSource:
+    '''
+    Reads the procurement export from a PostgreSQL table. The column projection, the item filter
+    and the Booking Date window are pushed into the query, and rows are streamed through a
+    server-side cursor in batches of batch_size so the table is never loaded at once.
+    '''
+    def __init__(self, table_name, db_url=None, engine=None, batch_size=100000):
+        self.table_name = table_name
+        self.engine = engine if engine is not None else get_engine(db_url)
+        self.batch_size = batch_size
+
+    def quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def build_query(self, columns, item_column=None, item_names=None, date_column=None, date_from=None, date_to=None):
+        #### SELECT of only the needed columns, with the filters as bound parameters
+        conditions, params = [], {}
+        if item_names is not None:
+            #### Same normalization as ingestion (str.strip + lower). Names with non-ASCII characters always pass,
+            #### since lower() there depends on the server locale; the exact mapping join still runs on every batch
+            item = self.quote(item_column)
+            conditions.append(f"(lower(btrim({item}, :whitespace)) = ANY(:item_names) OR {item} ~ '[^\\x01-\\x7F]')")
+            params['item_names'] = list(item_names)
+            params['whitespace'] = WHITESPACE
+        if date_from is not None:
+            conditions.append(f"{self.quote(date_column)} >= :date_from")
+            params['date_from'] = pd.Timestamp(date_from).to_pydatetime()
+        if date_to is not None:
+            conditions.append(f"{self.quote(date_column)} < :date_to")
+            params['date_to'] = pd.Timestamp(date_to).to_pydatetime()
+
+        query = f"SELECT {', '.join(self.quote(column) for column in columns)} FROM {self.quote(self.table_name)}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return query, params
+
+    def read_batches(self, columns, **filters):
+        #### Generator of DataFrames with at most batch_size rows each
+        try:
+            query, params = self.build_query(columns, **filters)
+            logging.info(f"Streaming {self.table_name} in batches of {self.batch_size}: {query}")
+            with self.engine.connect() as conn:
+                conn = conn.execution_options(stream_results=True, max_row_buffer=self.batch_size)
+                for batch in pd.read_sql(text(query), conn, params=params, chunksize=self.batch_size):
+                    yield batch
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,141 @@
+import io
+import sys
+import csv
+from src.exception import CustomException
+from src.logger import logging
+from sqlalchemy import create_engine, text, inspect
+
+
+#### One pooled engine per database URL, shared by every writer in the process
+_ENGINES = {}
+
+
+def get_engine(db_url, pool_size=5):
+    engine = _ENGINES.get(db_url)
+    if engine is None:
+        engine = create_engine(db_url, pool_size=pool_size, pool_pre_ping=True)
+        _ENGINES[db_url] = engine
+    return engine
+
+
+def copy_insert(table, conn, keys, data_iter):
+    '''
+    pandas to_sql insertion method that streams the rows through COPY ... FROM STDIN
+    instead of batched INSERT statements.
+    '''
+    dbapi_conn = conn.connection
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    preparer = conn.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(key) for key in keys)
+    table_name = preparer.quote(table.name)
+    if table.schema:
+        table_name = f"{preparer.quote(table.schema)}.{table_name}"
+    copy_sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    with dbapi_conn.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql=copy_sql, file=buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+class PostgresWriter:
+    '''
+    Bulk loader for the forecast tables. Frames are loaded into a staging table with COPY and
+    swapped in for the target inside one transaction, so readers never see an empty table.
+    An engine can be passed in (a local Postgres, or e.g. SQLite as a stand-in, which falls back
+    to multi-row INSERTs because it has no COPY).
+    '''
+    def __init__(self, db_url=None, engine=None, chunksize=100000):
+        self.engine = engine if engine is not None else get_engine(db_url)
+        self.chunksize = chunksize
+
+    @property
+    def supports_copy(self):
+        return self.engine.dialect.name == 'postgresql'
+
+    def quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def load(self, df, table_name, conn):
+        #### Append df to an existing table over conn, with COPY on PostgreSQL
+        method = copy_insert if self.supports_copy else 'multi'
+        chunksize = self.chunksize if self.supports_copy else 500
+        df.to_sql(table_name, conn, if_exists='append', index=False, method=method, chunksize=chunksize)
+
+    def create_indexes(self, conn, table_name, key_columns=None, unique=False, run_column=None):
+        #### Indexes are named after the table so they are recreated along with it
+        if key_columns:
+            columns = ', '.join(self.quote(column) for column in key_columns)
+            unique_sql = 'UNIQUE ' if unique else ''
+            conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {self.quote(table_name + '_key_idx')} "
+                              f"ON {self.quote(table_name)} ({columns})"))
+        if run_column:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {self.quote(table_name + '_run_idx')} "
+                              f"ON {self.quote(table_name)} ({self.quote(run_column)})"))
+
+    def table_columns(self, table_name):
+        inspector = inspect(self.engine)
+        if not inspector.has_table(table_name):
+            return None
+        return [column['name'] for column in inspector.get_columns(table_name)]
+
+    def replace_table(self, df, table_name, key_columns=None, unique=False, run_column=None):
+        try:
+            staging_table = f"{table_name}__staging"
+            with self.engine.begin() as conn:
+                # Create the staging table with the frame's schema, then bulk load it
+                df.head(0).to_sql(staging_table, conn, if_exists='replace', index=False)
+                self.load(df, staging_table, conn)
+
+                # Swap it in; DDL is transactional so the old table stays visible until commit
+                conn.execute(text(f"DROP TABLE IF EXISTS {self.quote(table_name)}"))
+                conn.execute(text(f"ALTER TABLE {self.quote(staging_table)} RENAME TO {self.quote(table_name)}"))
+                self.create_indexes(conn, table_name, key_columns, unique, run_column)
+
+            logging.info(f"Loaded {len(df)} rows into {table_name} through {staging_table}")
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def upsert(self, df, table_name, key_columns, run_id, run_column='run_id', prune_stale=True):
+        '''
+        Insert or update the rows of df keyed on key_columns, tagging them with run_id.
+        With prune_stale, rows of the written uniqueIDs that this run did not touch (e.g. forecast
+        dates that fell out of the horizon) are deleted; otherwise they are kept with their older run_id.
+        '''
+        try:
+            df = df.assign(**{run_column: run_id})
+            staging_table = f"{table_name}__upsert"
+            columns = list(df.columns)
+            column_list = ', '.join(self.quote(column) for column in columns)
+            key_list = ', '.join(self.quote(column) for column in key_columns)
+            update_list = ', '.join(f"{self.quote(column)} = excluded.{self.quote(column)}"
+                                    for column in columns if column not in key_columns)
+            series_column = self.quote(key_columns[0])
+
+            with self.engine.begin() as conn:
+                self.create_indexes(conn, table_name, key_columns, unique=True, run_column=run_column)
+                df.head(0).to_sql(staging_table, conn, if_exists='replace', index=False)
+                self.load(df, staging_table, conn)
+
+                conn.execute(text(f"INSERT INTO {self.quote(table_name)} ({column_list}) "
+                                  f"SELECT {column_list} FROM {self.quote(staging_table)} WHERE true "
+                                  f"ON CONFLICT ({key_list}) DO UPDATE SET {update_list}"))
+                if prune_stale:
+                    pruned = conn.execute(text(f"DELETE FROM {self.quote(table_name)} "
+                                               f"WHERE {series_column} IN (SELECT {series_column} FROM {self.quote(staging_table)}) "
+                                               f"AND {self.quote(run_column)} <> :run_id"), {'run_id': run_id})
+                    logging.info(f"Pruned {pruned.rowcount} stale rows from {table_name}")
+                conn.execute(text(f"DROP TABLE {self.quote(staging_table)}"))
+
+            logging.info(f"Upserted {len(df)} rows into {table_name} for run {run_id}")
+
+        except Exception as e:
+            raise CustomException(e, sys)
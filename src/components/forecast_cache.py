@@ -0,0 +1,80 @@
+import os
+import sys
+import hashlib
+import pickle
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+
+
+class ForecastCache:
+    '''
+    Persistent per-series forecast cache. Entries are pickled (prediction_df, actual_df) pairs
+    stored as <key>.pkl under cache_dir. Hits refresh the file mtime and the oldest files are
+    evicted once more than max_entries are stored (LRU).
+    '''
+    def __init__(self, cache_dir, max_entries=10000):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, df, max_date, params, code_version):
+        #### Fingerprint of (series data, max_date, hyperparameters, code version)
+        try:
+            digest = hashlib.sha256()
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+            digest.update(str(list(df.columns)).encode())
+            digest.update(str(max_date).encode())
+            digest.update(repr(sorted(params.items())).encode())
+            digest.update(str(code_version).encode())
+            return digest.hexdigest()
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file_obj:
+                value = pickle.load(file_obj)
+            os.utime(path)
+            self.hits += 1
+            return value
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            #### A corrupt entry is treated as a miss and refitted
+            logging.error(f"Failed to read forecast cache entry {key}: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        try:
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'wb') as file_obj:
+                pickle.dump(value, file_obj)
+            os.replace(tmp_path, self._path(key))
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.pkl')]
+            excess = len(entries) - self.max_entries
+            if excess <= 0:
+                return 0
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:excess]:
+                os.remove(entry.path)
+            logging.info(f"Evicted {excess} least recently used forecast cache entries")
+            return excess
+
+        except Exception as e:
+            raise CustomException(e, sys)
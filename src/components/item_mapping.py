@@ -0,0 +1,133 @@
+import os
+import sys
+import hashlib
+import pickle
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import clean_string_columns
+
+
+MAPPING_COLUMNS = ['Item_Name','Category_Standard','Item_Name_Standard','CategoryID_Standard']
+
+
+class ItemMappingIndex:
+    '''
+    Compiled item-name mapping. The mapping CSV is cleaned once (strip, lowercase, drop duplicates,
+    Remove_flag == '0') and pickled together with the size, mtime and sha256 of the source file.
+    The compiled table is rebuilt only when the source content changes. Lookups hash the
+    normalized item name against an Index instead of re-reading the CSV and merging on every run.
+    '''
+    def __init__(self, source_path, index_path):
+        self.source_path = source_path
+        self.index_path = index_path
+        self.mapping = None
+        self._source_meta = None
+        self._items = None
+
+    def _stat(self):
+        stat = os.stat(self.source_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _sha256(self):
+        digest = hashlib.sha256()
+        with open(self.source_path, 'rb') as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def compile(self):
+        try:
+            mapping_df = pd.read_csv(self.source_path,encoding = 'latin1'
+                                        ,usecols=['Item_Name','Item_Name_Standard','Category_Standard','Remove_flag','CategoryID_Standard'])
+
+            #### Strip, lowercase the item names and cast Remove_flag in one pass (drop_duplicates is unaffected by the cast)
+            # mapping_df['Category_Standard'] = mapping_df['Category_Standard'].str.lower()
+            mapping_df = clean_string_columns(mapping_df, lower=['Item_Name','Item_Name_Standard'], as_str=['Remove_flag'])
+            mapping_df_ = mapping_df.drop_duplicates().reset_index(drop=True)
+            mapping_df_ = mapping_df_[mapping_df_['Remove_flag']=='0']
+
+            mapping = mapping_df_[MAPPING_COLUMNS].reset_index(drop=True)
+            mapping['CategoryID_Standard'] = mapping['CategoryID_Standard'].astype(str)
+
+            source_meta = dict(self._stat(), sha256=self._sha256())
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'wb') as file_obj:
+                pickle.dump({'source': source_meta, 'mapping': mapping}, file_obj)
+            os.replace(tmp_path, self.index_path)
+
+            self._set(mapping, source_meta)
+            logging.info(f"Compiled item mapping index with {len(mapping)} items to {self.index_path}")
+            return self
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _set(self, mapping, source_meta):
+        self.mapping = mapping
+        self._source_meta = source_meta
+        self._items = pd.Index(mapping['Item_Name'])
+
+    def load(self):
+        #### Load the compiled index, recompiling when it is missing or the source CSV content changed
+        try:
+            if not os.path.exists(self.index_path):
+                return self.compile()
+
+            with open(self.index_path, 'rb') as file_obj:
+                compiled = pickle.load(file_obj)
+            source_meta = compiled['source']
+
+            stat = self._stat()
+            if stat != {key: source_meta[key] for key in stat}:
+                # Touched or rewritten: only a content change needs a rebuild
+                if self._sha256() != source_meta['sha256']:
+                    logging.info(f"{self.source_path} changed, recompiling the item mapping index")
+                    return self.compile()
+                source_meta = dict(source_meta, **stat)
+                with open(self.index_path, 'wb') as file_obj:
+                    pickle.dump({'source': source_meta, 'mapping': compiled['mapping']}, file_obj)
+
+            self._set(compiled['mapping'], source_meta)
+            print('Mapping data shape',self.mapping.shape)
+            return self
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def map_items(self, df, item_column='Item_Name'):
+        '''
+        Inner join of df with the mapping on item_column (already normalized), in the row order of df.
+        Adds Category_Standard, Item_Name_Standard and CategoryID_Standard.
+        '''
+        try:
+            if self.mapping is None:
+                self.load()
+            if not self._items.is_unique:
+                return pd.merge(df, self.mapping.rename(columns={'Item_Name': item_column}), on=[item_column], how='inner')
+
+            positions = self._items.get_indexer(df[item_column])
+            matched = positions != -1
+            mapped = df[matched].reset_index(drop=True)
+            mapped_values = self.mapping.iloc[positions[matched], 1:].reset_index(drop=True)
+            for column in mapped_values.columns:
+                mapped[column] = mapped_values[column]
+            return mapped
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def items_in_categories(self, category_ids):
+        #### Normalized item names whose standard category is one of category_ids
+        if self.mapping is None:
+            self.load()
+        return self.mapping.loc[self.mapping['CategoryID_Standard'].isin(category_ids), 'Item_Name'].tolist()
+
+    def lookup(self, item_name):
+        #### Mapping rows for a single raw item name, e.g. for ad-hoc queries; empty when it is unmapped or removed
+        if self.mapping is None:
+            self.load()
+        normalized = item_name.strip().lower() if isinstance(item_name, str) else item_name
+        positions = self._items.get_indexer_for([normalized])
+        return self.mapping.iloc[positions[positions != -1]].to_dict('records')
@@ -1,66 +1,256 @@
 import os
+import re
 import sys
+import time
+import pickle
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
+from datetime import datetime
+from dataclasses import dataclass, field
 from src.exception import CustomException
 from src.logger import logging
-from prophet import Prophet
-from math import ceil
 import inspect
-from src.utils import save_object,save_variable
-from sqlalchemy import create_engine
-import yaml
-
-def read_db_config(path):
-    with open(path, 'r') as file:
-        config = yaml.safe_load(file)
-    db_config = config['db']
-    db_url = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
-    return db_url
-
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from src.utils import save_object,save_variable,ResultCollector,read_artifact_format,save_artifact,load_artifact,ArtifactWriter,read_db_config
+from src.components.data_transformation import DataTransformation
+from src.components.forecast_cache import ForecastCache
+from src.components.series_store import SeriesStore
+from src.components.baseline_forecaster import FourierBaselineForecaster
+from src.metrics import metrics
 
 @dataclass
 class ModelTrainingConfig:
     forecasted_df_file_paths = os.path.join('artifacts/model_trainer', "forecasted_df.csv")
+    forecast_intervals_path = os.path.join('artifacts/model_trainer', "forecast_intervals.csv")
     actual_df_file_paths = os.path.join('artifacts/model_trainer', "actual_df.csv")
     failded_ids_path = os.path.join('artifacts/model_trainer',"failed_unique_ids_iteamzied_level.txt")
-    db_url = read_db_config(path = 'config/config.yaml')
+    db_url: str = None    #### resolved from db_config_path when the tables are written
+    db_config_path: str = 'config/config.yaml'
+    n_jobs: int = 1          #### number of worker processes, 1 keeps the serial loop
+    chunk_size: int = 16     #### uniqueIDs sent to a worker per task
+    max_pool_retries: int = 1   #### extra fresh-pool runs of a uniqueID that crashed its worker on its own
+    series_store_dir = os.path.join('artifacts/model_trainer', "series_store")    #### memory-mapped by the workers of parallel runs
+    artifact_format: str = field(default_factory=read_artifact_format)    #### csv | parquet | feather
+    prophet_params: dict = field(default_factory=lambda: {'interval_width': 0.8})
+    forecast_periods: int = 52    #### weeks forecasted past the last actual week
+    use_forecast_cache: bool = True    #### reuse forecasts of series whose data, max_date and parameters are unchanged
+    forecast_cache_dir = os.path.join('artifacts/model_trainer', "forecast_cache")
+    forecast_cache_max_entries: int = 10000
+    warm_start: bool = True    #### initialise Stan from the previous run's fitted parameters of the same uniqueID
+    warm_start_dir = os.path.join('artifacts/model_trainer', "prophet_params")
+    point_forecast: bool = True    #### skip uncertainty sampling and compute yhat only (trend + seasonal terms)
+    prediction_intervals: bool = False    #### also write monthly yhat_lower/yhat_upper of the Prophet series to forecast_intervals_path
+    interval_samples: int = 1000    #### uncertainty samples drawn for the prediction intervals
+    db_write_mode: str = 'replace'    #### 'replace' swaps in the full tables, 'upsert' writes only the refitted series
+    db_key_columns: list = field(default_factory=lambda: ['uniqueID', 'Booking_Date'])
+    prune_stale_forecasts: bool = True    #### upsert mode: delete rows of refitted series not written by this run
+    model_engine: str = 'prophet'    #### 'prophet' | 'baseline' (batched Fourier regression) | 'auto' (Prophet only for high-volume series)
+    prophet_min_nonzero_weeks: int = 26    #### auto: weeks with purchases a series needs to be fitted with Prophet
+    prophet_min_total_amount: float = 1000.0    #### auto: total Gross_Amount a series needs to be fitted with Prophet
+    baseline_yearly_order: int = 3    #### Fourier terms of the baseline's yearly seasonality
+
+
+WARM_START_PARAMS = ['k', 'm', 'delta', 'beta', 'sigma_obs']
+INTERVAL_COLUMNS = ['yhat_lower', 'yhat_upper']
+
+
+def predict_point_forecast(model, future):
+    ''' yhat of a fitted Prophet model without uncertainty simulation or per-component output columns.
+    Same arithmetic as Prophet.predict: yhat = trend * (1 + multiplicative_terms) + additive_terms '''
+    df = model.setup_dataframe(future.copy())
+    trend = model.predict_trend(df)
+    seasonal_features, _, component_cols, _ = model.make_all_seasonality_features(df)
+    X = seasonal_features.values
+    beta = model.params['beta']
+    additive_terms = np.nanmean(np.matmul(X, (beta * component_cols['additive_terms'].values).transpose()), axis=1) * model.y_scale
+    multiplicative_terms = np.nanmean(np.matmul(X, (beta * component_cols['multiplicative_terms'].values).transpose()), axis=1)
+    return pd.DataFrame({'ds': df['ds'].values, 'yhat': trend * (1 + multiplicative_terms) + additive_terms})
+
+
+def predict_intervals(model, future, uncertainty_samples=1000):
+    ''' Opt-in uncertainty intervals (yhat_lower/yhat_upper, trend_lower/trend_upper) for a fitted model,
+    computed with Prophet's vectorized sampler in one batch over all future dates. '''
+    df = model.setup_dataframe(future.copy())
+    df['trend'] = model.predict_trend(df)
+    previous_samples = model.uncertainty_samples
+    model.uncertainty_samples = uncertainty_samples
+    try:
+        intervals = model.predict_uncertainty(df, vectorized=True)
+    finally:
+        model.uncertainty_samples = previous_samples
+    intervals.insert(0, 'ds', df['ds'].values)
+    return intervals
+
+
+def stan_iterations(model):
+    #### Number of optimizer iterations of the last Prophet fit, parsed from the CmdStan console output
+    try:
+        iterations = None
+        for stdout_file in model.stan_backend.stan_fit.runset.stdout_files:
+            with open(stdout_file) as file_obj:
+                for line in file_obj:
+                    match = re.match(r'\s*(?:Iteration\s+)?(\d+)[.\s]', line)
+                    if match:
+                        iterations = int(match.group(1))
+        return iterations
+    except Exception:
+        return None
+
+
+def forecast_code_version(include_prophet=True):
+    #### Forecast cache entries are invalidated whenever the forecasting code or Prophet changes;
+    #### baseline-only keys leave Prophet out so a baseline run never imports it
+    digest = hashlib.sha256()
+    if include_prophet:
+        import prophet
+        digest.update(prophet.__version__.encode())
+    for module_file in (__file__, inspect.getfile(DataTransformation), inspect.getfile(FourierBaselineForecaster)):
+        with open(module_file, 'rb') as file_obj:
+            digest.update(file_obj.read())
+    return digest.hexdigest()
+
+
+def _run_model_chunk(model, chunk, max_date=None):
+    ''' Fit the model for every (unique_id, df_subset) pair of a chunk.
+    Runs in the parent for serial runs and inside worker processes for parallel runs. '''
+    results = []
+    failed_unique_ids = []
+    # Check if the model function requires max_date as an argument
+    model_args = inspect.signature(model).parameters
+    for unique_id, df_subset in chunk:
+        try:
+            logging.info(f"Processing unique ID: {unique_id} ({len(df_subset)} rows)")
+
+            # Apply model function to the subset of data
+            if 'max_date' in model_args:
+                prediction_df, actual_df = model(df_subset, max_date)
+            else:
+                prediction_df, actual_df = model(df_subset)
+
+            logging.info(f"Forecast for {unique_id}: {len(prediction_df)} predicted and {len(actual_df)} actual rows")
+            results.append((unique_id, prediction_df, actual_df))
+
+        except Exception as e:
+            logging.error(f"Failed to process unique ID {unique_id}: {e}")
+            failed_unique_ids.append(unique_id)
+    return results, failed_unique_ids
+
+
+def _run_model_store_chunk(model, store_dir, positions, max_date=None):
+    ''' Worker entry point: memory-map the series store and fit the series at positions. '''
+    store = SeriesStore.open_cached(store_dir)
+    return _run_model_chunk(model, store.items(positions), max_date) + (metrics.pop_state(),)
+
+
+def _run_model_frame_chunk(model, chunk, max_date=None):
+    ''' Worker entry point for chunks of (unique_id, df_subset) pairs. '''
+    return _run_model_chunk(model, chunk, max_date) + (metrics.pop_state(),)
 
 
 class ModelTraining:
-    def __init__(self):
+    def __init__(self, writer=None):
         self.model_training_config = ModelTrainingConfig()
+        self.writer = writer or ArtifactWriter()
+        self.run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+        self.refit_unique_ids = None    #### uniqueIDs fitted (not served from the forecast cache) in the last run
+        self.data_transformation = DataTransformation()
+        self.baseline = None    #### FourierBaselineForecaster fitted to the baseline series of the current run
+
+
+    def replace_negatives_with_weighted_average(self,forecast_data,group_sizes=None):
+        '''
+        Replace each negative value by the inverse-distance weighted average of its nearest
+        non-negative neighbours (weights 1/(distance+1)). The neighbour search is symmetric and
+        stops at the nearer array end, so negatives near the ends may stay unchanged.
+        group_sizes splits forecast_data into consecutive series that are handled independently,
+        so the forecasts of all series can be processed in one call.
+        Returns the updated values and the number of negative values found.
+        '''
+        values = np.asarray(forecast_data, dtype=np.float64)
+        n = len(values)
+        updated_forecast = values.copy()
+        if group_sizes is None:
+            group_sizes = [n]
+        group_sizes = np.asarray(group_sizes, dtype=np.int64)
+        group_starts = np.repeat(np.cumsum(group_sizes) - group_sizes, group_sizes)
+        group_ends = group_starts + np.repeat(group_sizes, group_sizes) - 1
+
+        #### Position of the last non-negative value at or before / first one at or after every index
+        positions = np.arange(n)
+        non_negative = values >= 0
+        prev_non_negative = np.maximum.accumulate(np.where(non_negative, positions, -1)) if n else positions
+        next_non_negative = np.minimum.accumulate(np.where(non_negative, positions, n)[::-1])[::-1] if n else positions
+
+        negatives = np.flatnonzero(values < 0)
+        replaced_count = len(negatives)
+        if replaced_count:
+            starts = group_starts[negatives]
+            ends = group_ends[negatives]
+            # The search only looks as far as the nearer end of the series
+            reach = np.minimum(negatives - starts, ends - negatives)
+
+            left = np.where(negatives > starts, prev_non_negative[np.maximum(negatives - 1, 0)], -1)
+            right = np.where(negatives < ends, next_non_negative[np.minimum(negatives + 1, n - 1)], n)
+            left_distance = np.where(left >= starts, negatives - left, n + 1)
+            right_distance = np.where(right <= ends, right - negatives, n + 1)
+
+            # The search stops at the first step where both sides have been seen; by then the side found
+            # first has been overwritten by its farthest non-negative value within that step count
+            steps = np.maximum(left_distance, right_distance)
+            found = steps <= reach
+            i = negatives[found]
+            steps = steps[found]
+            neighbour_1 = next_non_negative[i - steps]
+            neighbour_2 = prev_non_negative[i + steps]
+            weight_1 = 1 / (i - neighbour_1 + 1)  # Adding 1 to avoid division by zero
+            weight_2 = 1 / (neighbour_2 - i + 1)  # Adding 1 to avoid division by zero
+            updated_forecast[i] = (values[neighbour_1] * weight_1 + values[neighbour_2] * weight_2) / (weight_1 + weight_2)
+
+        if isinstance(forecast_data, pd.Series):
+            updated_forecast = pd.Series(updated_forecast, index=forecast_data.index, name=forecast_data.name)
+        return updated_forecast, replaced_count
 
 
-    def replace_negatives_with_weighted_average(self,forecast_data):
-
-        replaced_count = 0
-        updated_forecast = forecast_data.copy()
-        for i, val in enumerate(forecast_data):
-            if val < 0:  # Handle negative values
-                closest_non_negative_1 = None
-                closest_non_negative_2 = None
-                distance_1 = None
-                distance_2 = None
-                # Find the two closest non-negative numbers
-                for j in range(1, min(i+1, len(forecast_data)-i)):
-                    if forecast_data[i-j] >= 0:
-                        closest_non_negative_1 = forecast_data[i-j]
-                        distance_1 = j
-                    if forecast_data[i+j] >= 0:
-                        closest_non_negative_2 = forecast_data[i+j]
-                        distance_2 = j
-                    if closest_non_negative_1 is not None and closest_non_negative_2 is not None:
-                        break
-                # Compute the weights based on the inverse of the distances
-                if closest_non_negative_1 is not None and closest_non_negative_2 is not None:
-                    weight_1 = 1 / (distance_1 + 1)  # Adding 1 to avoid division by zero
-                    weight_2 = 1 / (distance_2 + 1)  # Adding 1 to avoid division by zero
-                    total_weight = weight_1 + weight_2
-                    weighted_avg = (closest_non_negative_1 * weight_1 + closest_non_negative_2 * weight_2) / total_weight
-                    updated_forecast[i] = weighted_avg
-                replaced_count+=1 
-        return updated_forecast, replaced_count
+    def prophet_model_params(self):
+        #### Prophet constructor arguments; point forecasts switch off uncertainty sampling
+        params = dict(self.model_training_config.prophet_params)
+        if self.model_training_config.point_forecast:
+            params['uncertainty_samples'] = 0
+        return params
+
+
+    def _warm_start_path(self,unique_id):
+        file_name = hashlib.sha1(str(unique_id).encode('utf-8')).hexdigest() + '.pkl'
+        return os.path.join(self.model_training_config.warm_start_dir, file_name)
+
+
+    def load_warm_start(self,unique_id):
+        #### Fitted parameters of this uniqueID from the previous run, None when there are none
+        path = self._warm_start_path(unique_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as file_obj:
+                return pickle.load(file_obj)
+        except Exception as e:
+            logging.error(f"Failed to read warm start parameters of {unique_id}: {e}")
+            return None
+
+
+    def save_warm_start(self,unique_id,params):
+        try:
+            os.makedirs(self.model_training_config.warm_start_dir, exist_ok=True)
+            warm_start = {'k': float(params['k'][0][0]), 'm': float(params['m'][0][0]), 'sigma_obs': float(params['sigma_obs'][0][0]),
+                          'delta': np.asarray(params['delta'][0]), 'beta': np.asarray(params['beta'][0])}
+            # Each uniqueID has its own file so parallel workers never write the same file
+            tmp_path = self._warm_start_path(unique_id) + f'.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as file_obj:
+                pickle.dump(warm_start, file_obj)
+            os.replace(tmp_path, self._warm_start_path(unique_id))
+        except Exception as e:
+            logging.error(f"Failed to save warm start parameters of {unique_id}: {e}")
 
 
     def model_(self,df,max_date):
@@ -69,96 +259,302 @@ class ModelTraining:
 
             # df = pd.read_csv(preprocessed_file_path,encoding=encoding)
 
-            def week_of_month(dt):
-                    first_day = dt.replace(day=1)
-                    dom = dt.day
-                    adjusted_dom = dom + first_day.weekday()
-                    return int(ceil(adjusted_dom/7.0))
-
-            
             # print(df.Booking_Date.max())
-            df['Week_Number'] = df['Booking_Date'].apply(lambda x: week_of_month(x))
             prophet_df = df.rename(columns={'Booking_Date': 'ds', 'Gross_Amount': 'y'})
 
-            model = Prophet(interval_width = 0.8)
-            model.fit(prophet_df)
-            future = model.make_future_dataframe(freq='W',periods=52)
-            forecast = model.predict(future)
-            forecast_sel_col = ['ds', 'yhat']
-            forecast = forecast[forecast_sel_col]
-            forecast.rename(columns={'ds': 'Booking_Date', 'yhat':'predicted'}, inplace=True)
-
+            unique_id = df['uniqueID'].iloc[-1]
+            #### Prophet (and cmdstanpy) are imported on the first fit, not when the module loads
+            from prophet import Prophet
+            model = Prophet(**self.prophet_model_params())
+
+            #### Warm start Stan from the previous run's parameters; Prophet falls back to its default
+            #### initial values for delta/beta when the number of changepoints or seasonal features changed
+            warm_start = self.load_warm_start(unique_id) if self.model_training_config.warm_start else None
+            fit_start = time.perf_counter()
+            if warm_start is not None:
+                model.fit(prophet_df, init=warm_start)
+            else:
+                model.fit(prophet_df)
+            fit_seconds = time.perf_counter() - fit_start
+            metrics.add_time('fit', fit_seconds)
+
+            if warm_start is None:
+                start_mode = 'cold start'
+            elif all(np.shape(warm_start[param]) == model.params[param][0].shape for param in ['delta', 'beta']):
+                start_mode = 'warm start'
+            else:
+                start_mode = 'cold start (series shape changed)'
+            iterations = stan_iterations(model)
+            logging.info(f"Prophet fit for {unique_id}: {start_mode}, {iterations} iterations, {fit_seconds:.3f}s")
+            if self.model_training_config.warm_start:
+                self.save_warm_start(unique_id, model.params)
+            predict_start = time.perf_counter()
+            future = model.make_future_dataframe(freq='W',periods=self.model_training_config.forecast_periods)
+            if self.model_training_config.point_forecast:
+                forecast = predict_point_forecast(model, future)
+            else:
+                forecast = model.predict(future)
+            if self.model_training_config.prediction_intervals and 'yhat_lower' not in forecast:
+                #### Opt-in intervals from one vectorized uncertainty batch on top of the point forecast
+                intervals = predict_intervals(model, future, self.model_training_config.interval_samples)
+                forecast = forecast.assign(yhat_lower=intervals['yhat_lower'].values, yhat_upper=intervals['yhat_upper'].values)
+            predict_seconds = time.perf_counter() - predict_start
+            metrics.add_time('predict', predict_seconds)
+            metrics.observe_series(unique_id, rows=len(df), fit_seconds=fit_seconds, predict_seconds=predict_seconds,
+                                   iterations=iterations, start_mode=start_mode)
             logging.info("Prophet model forecasting completed successfully")
-            
-            ## Handling the negative values with a specific function
-            forecast['predicted'], _ = self.replace_negatives_with_weighted_average(forecast['predicted'])
-            forecast['uniqueID'] = df['uniqueID'].iloc[-1]
-            merged_df = pd.merge(df, forecast, on=['uniqueID','Booking_Date'], how ='right')
-            merged_df_ = merged_df[['uniqueID','Booking_Date', 'Gross_Amount', 'predicted']]
-
-
-            ##### weekly Predicted value aggregated into monthly
-            prophet_agg_prediction_df = merged_df_.groupby(['uniqueID', pd.Grouper(key='Booking_Date', freq='ME')]).sum().reset_index()
-            #### Predicted value if negative it will be convert it into zero
-            prophet_agg_prediction_df['predicted'] = prophet_agg_prediction_df['predicted'].apply(lambda x: max(0,x))
-
-            #### Actual Data frame
-            actual_df = prophet_agg_prediction_df[prophet_agg_prediction_df['Booking_Date']<= max_date]
-            sel_col = ['uniqueID','Booking_Date','Gross_Amount']
-            actual_df = actual_df[sel_col]
-
-            #### Prediction Data frame
-            prediction_df = prophet_agg_prediction_df[prophet_agg_prediction_df['Booking_Date']> max_date]
-            sel_col_pre = ['uniqueID','Booking_Date','predicted']
-            prediction_df = prediction_df[sel_col_pre]
-
-            return prediction_df, actual_df
+            return self.forecast_outputs(df, forecast, max_date)
         
         except CustomException as e:
             raise CustomException(e,sys)
 
-    def run_model_for_all_ids(self, model, filtered_df, max_date=None,model_name=""):
+
+    def forecast_outputs(self,df,forecast,max_date):
+        ''' Monthly actual and prediction frames of one series from its weekly ds/yhat forecast.
+        Shared by the Prophet and baseline models so both return the same shape. Interval bounds
+        in the forecast (prediction_intervals) are summed to months like the prediction and kept
+        as extra yhat_lower/yhat_upper columns of the prediction frame. '''
+        interval_cols = [col for col in INTERVAL_COLUMNS if col in forecast.columns and self.model_training_config.prediction_intervals]
+        forecast_sel_col = ['ds', 'yhat'] + interval_cols
+        forecast = forecast[forecast_sel_col]
+        forecast = forecast.rename(columns={'ds': 'Booking_Date', 'yhat':'predicted'})
+
+        ## Handling the negative values with a specific function
+        forecast['predicted'], _ = self.replace_negatives_with_weighted_average(forecast['predicted'])
+        forecast['uniqueID'] = df['uniqueID'].iloc[-1]
+        merged_df = pd.merge(df, forecast, on=['uniqueID','Booking_Date'], how ='right')
+        merged_df_ = merged_df[['uniqueID','Booking_Date', 'Gross_Amount', 'predicted'] + interval_cols]
+
+
+        ##### weekly Predicted value aggregated into monthly
+        prophet_agg_prediction_df = self.data_transformation.resample(merged_df_, freq='ME')
+        #### Predicted value if negative it will be convert it into zero
+        prophet_agg_prediction_df['predicted'] = prophet_agg_prediction_df['predicted'].apply(lambda x: max(0,x))
+        for col in interval_cols:
+            prophet_agg_prediction_df[col] = prophet_agg_prediction_df[col].clip(lower=0)
+
+        #### Actual Data frame
+        actual_df = prophet_agg_prediction_df[prophet_agg_prediction_df['Booking_Date']<= max_date]
+        sel_col = ['uniqueID','Booking_Date','Gross_Amount']
+        actual_df = actual_df[sel_col]
+
+        #### Prediction Data frame
+        prediction_df = prophet_agg_prediction_df[prophet_agg_prediction_df['Booking_Date']> max_date]
+        sel_col_pre = ['uniqueID','Booking_Date','predicted'] + interval_cols
+        prediction_df = prediction_df[sel_col_pre]
+
+        return prediction_df, actual_df
+
+
+    def baseline_forecaster(self):
+        return FourierBaselineForecaster(yearly_order=self.model_training_config.baseline_yearly_order,
+                                         forecast_periods=self.model_training_config.forecast_periods)
+
+
+    def baseline_model_(self,df,max_date):
+        ''' Same contract as model_, with the batched Fourier baseline instead of Prophet. Uses the forecast
+        of the batch fitted in run_model_for_all_ids, or fits this series alone when called directly. '''
         try:
-            # Initialize empty DataFrames to store the results
-            all_prediction_df = pd.DataFrame()
-            all_actual_df = pd.DataFrame()
+            unique_id = df['uniqueID'].iloc[-1]
+            predict_start = time.perf_counter()
+            if self.baseline is None or unique_id not in self.baseline:
+                self.baseline = self.baseline_forecaster().fit([(unique_id, df)])
+            forecast = self.baseline.predict(unique_id)
+            metrics.add_time('baseline_predict', time.perf_counter() - predict_start)
+            return self.forecast_outputs(df, forecast, max_date)
 
-            # List to store unique IDs that fail
-            failed_unique_ids = []
+        except Exception as e:
+            raise CustomException(e,sys)
 
-            # Check if the model function requires max_date as an argument
-            model_args = inspect.signature(model).parameters
 
-            # Iterate over unique IDs for Prophet model
-            for unique_id in filtered_df['uniqueID'].unique():
+    def select_engine(self,df):
+        #### auto mode: Prophet for series with enough purchase weeks and spend, the baseline for the rest
+        config = self.model_training_config
+        if config.model_engine not in ('prophet', 'baseline', 'auto'):
+            raise ValueError(f"Unknown model_engine {config.model_engine!r}")
+        if config.model_engine != 'auto':
+            return config.model_engine
+        amounts = df['Gross_Amount'].to_numpy()
+        high_volume = (np.count_nonzero(amounts) >= config.prophet_min_nonzero_weeks
+                       and amounts.sum() >= config.prophet_min_total_amount)
+        return 'prophet' if high_volume else 'baseline'
+
+
+    def _run_pool(self, model, chunks, max_date=None, store_dir=None):
+        ''' Run chunks in one process pool. Returns the per-chunk outputs keyed by chunk index and
+        the indices of the chunks lost to a crashed worker (a crash breaks every unfinished chunk). '''
+        outputs = {}
+        broken = []
+        #### Workers start with empty metrics (a forked worker would otherwise inherit the parent's)
+        with ProcessPoolExecutor(max_workers=min(self.model_training_config.n_jobs, len(chunks)), initializer=metrics.reset) as executor:
+            if store_dir is not None:
+                futures = {executor.submit(_run_model_store_chunk, model, store_dir, [position for _, position in chunk], max_date): i
+                           for i, chunk in enumerate(chunks)}
+            else:
+                futures = {executor.submit(_run_model_frame_chunk, model, chunk, max_date): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                chunk_idx = futures[future]
                 try:
-                    logging.info(f"Processing unique ID: {unique_id}")
-                    # Filter dataframe for each unique ID
-                    df_subset = filtered_df[filtered_df['uniqueID'] == unique_id].reset_index(drop=True)
-                    logging.info(df_subset.head())
-                    
-                    # Apply model function to the subset of data
-                    if 'max_date' in model_args:
-                        prediction_df, actual_df = model(df_subset, max_date)
-                    else:
-                        prediction_df, actual_df = model(df_subset)
-                    
-                    logging.info(f"Prediction DataFrame for {unique_id}: {prediction_df.head()}")
-                    logging.info(f"Actual DataFrame for {unique_id}: {actual_df.head()}")
-                    
-                    # Append the results to the main result DataFrames
-                    all_prediction_df = pd.concat([all_prediction_df,prediction_df], ignore_index=True)
-                    all_actual_df = pd.concat([all_actual_df,actual_df], ignore_index=True)
-
+                    chunk_results, chunk_failed, worker_metrics = future.result()
+                    metrics.merge_state(worker_metrics)
+                    outputs[chunk_idx] = (chunk_results, chunk_failed)
+                except BrokenProcessPool as e:
+                    logging.error(f"Worker pool crashed while processing chunk {chunk_idx}: {e}")
+                    broken.append(chunk_idx)
                 except Exception as e:
-                    logging.error(f"Failed to process unique ID {unique_id}: {e}")
-                    failed_unique_ids.append(unique_id)
+                    logging.error(f"Chunk {chunk_idx} failed: {e}")
+                    outputs[chunk_idx] = ([], [unique_id for unique_id, _ in chunks[chunk_idx]])
+        return outputs, sorted(broken)
+
+
+    def run_model_parallel(self, model, chunks, max_date=None, store_dir=None):
+        ''' Submit chunks to a process pool and return the per-chunk outputs keyed by chunk index.
+        With store_dir, chunks are (unique_id, position) pairs and workers read the series from the
+        memory-mapped SeriesStore instead of receiving pickled frames.
+        Chunks lost to a crashed worker are retried one uniqueID per task, all of them in one fresh pool
+        per round. A round keeps whatever finished before a new crash; when a round finishes nothing, the
+        uniqueIDs that were running (the first n_jobs) are run alone, one pool each, so only a uniqueID that
+        crashes its worker on its own (max_pool_retries + 1 times) is reported as failed. '''
+        outputs, broken = self._run_pool(model, chunks, max_date, store_dir)
+        if not broken:
+            return outputs
+
+        singles = [[pair] for chunk_idx in broken for pair in chunks[chunk_idx]]
+        single_outputs = {}
+        pending = list(range(len(singles)))
+        logging.info(f"Retrying the {len(singles)} unique IDs of {len(broken)} crashed chunks one per task")
+        while pending:
+            round_outputs, lost = self._run_pool(model, [singles[i] for i in pending], max_date, store_dir)
+            for j, output in round_outputs.items():
+                single_outputs[pending[j]] = output
+            lost = [pending[j] for j in lost]
+            if len(lost) < len(pending):
+                pending = lost
+                continue
+
+            #### Nothing finished, so the crash came from the first tasks picked up by the workers
+            n_jobs = self.model_training_config.n_jobs
+            suspects, pending = lost[:n_jobs], lost[n_jobs:]
+            for i in suspects:
+                for attempt in range(self.model_training_config.max_pool_retries + 1):
+                    isolated_output, isolated_lost = self._run_pool(model, [singles[i]], max_date, store_dir)
+                    if not isolated_lost:
+                        single_outputs[i] = isolated_output[0]
+                        break
+                else:
+                    logging.error(f"Unique ID {singles[i][0][0]} crashed its worker on its own, reporting it as failed")
+                    single_outputs[i] = ([], [singles[i][0][0]])
+
+        #### Reassemble the broken chunks in their original uniqueID order
+        i = 0
+        for chunk_idx in broken:
+            chunk_results, chunk_failed = [], []
+            for _ in chunks[chunk_idx]:
+                chunk_results.extend(single_outputs[i][0])
+                chunk_failed.extend(single_outputs[i][1])
+                i += 1
+            outputs[chunk_idx] = (chunk_results, chunk_failed)
+        return outputs
+
+
+    def run_model_for_all_ids(self, model, filtered_df, max_date=None,model_name=""):
+        try:
+            # List to store unique IDs that fail
+            failed_unique_ids = []
+
+            #### Partition the data once; every series is then a slice of contiguous arrays with a plain string key
+            store = SeriesStore.from_frame(filtered_df)
+            series = list(store.items())
+
+            #### Engine of every series: model (Prophet) or the batched baseline, see model_engine
+            engines = {unique_id: self.select_engine(df_subset) for unique_id, df_subset in series}
+            engine_params = {
+                'prophet': {'model': getattr(model, '__qualname__', str(model)),
+                            'prophet_params': self.prophet_model_params(),
+                            'forecast_periods': self.model_training_config.forecast_periods,
+                            'prediction_intervals': self.model_training_config.prediction_intervals,
+                            'interval_samples': self.model_training_config.interval_samples},
+                'baseline': {'model': self.baseline_model_.__qualname__,
+                             'baseline_yearly_order': self.model_training_config.baseline_yearly_order,
+                             'forecast_periods': self.model_training_config.forecast_periods},
+            }
+
+            #### Reuse cached forecasts for series whose data, max_date and parameters did not change
+            results = {}
+            cache_keys = {}
+            forecast_cache = None
+            if self.model_training_config.use_forecast_cache:
+                forecast_cache = ForecastCache(self.model_training_config.forecast_cache_dir,
+                                               max_entries=self.model_training_config.forecast_cache_max_entries)
+                code_versions = {engine: forecast_code_version(include_prophet=engine == 'prophet') for engine in set(engines.values())}
+                for unique_id, df_subset in series:
+                    engine = engines[unique_id]
+                    cache_keys[unique_id] = forecast_cache.key(df_subset, max_date, engine_params[engine], code_versions[engine])
+                    cached = forecast_cache.get(cache_keys[unique_id])
+                    if cached is not None:
+                        results[unique_id] = cached
+            to_fit = [(unique_id, df_subset) for unique_id, df_subset in series if unique_id not in results]
+            self.refit_unique_ids = [unique_id for unique_id, _ in to_fit]
+            baseline_fit = [(unique_id, df_subset) for unique_id, df_subset in to_fit if engines[unique_id] == 'baseline']
+            to_fit = [(unique_id, df_subset) for unique_id, df_subset in to_fit if engines[unique_id] == 'prophet']
+            metrics.increment('series_baseline', len(baseline_fit))
+            metrics.increment('series_prophet', len(to_fit))
+
+            # Split the series to fit into chunks of (unique_id, store position) pairs, keeping the uniqueID order
+            chunk_size = max(1, self.model_training_config.chunk_size)
+            to_fit_positions = [(unique_id, store.position(unique_id)) for unique_id, _ in to_fit]
+            chunks = [to_fit_positions[i:i + chunk_size] for i in range(0, len(to_fit_positions), chunk_size)]
+
+            if self.model_training_config.n_jobs > 1 and len(chunks) > 1:
+                logging.info(f"Running {model_name} for {len(to_fit)} unique IDs on {self.model_training_config.n_jobs} workers")
+                store_dir = store.save(self.model_training_config.series_store_dir)
+                outputs = self.run_model_parallel(model, chunks, max_date, store_dir=store_dir)
+            else:
+                outputs = {0: _run_model_chunk(model, to_fit, max_date)}
+
+            #### All baseline series are fitted in one batched least-squares solve in the parent
+            if baseline_fit:
+                logging.info(f"Running the Fourier baseline for {len(baseline_fit)} unique IDs")
+                with metrics.timer('baseline_fit'):
+                    self.baseline = self.baseline_forecaster().fit(baseline_fit)
+                outputs[-1] = _run_model_chunk(self.baseline_model_, baseline_fit, max_date)
+                self.baseline = None
+
+            for chunk_idx in sorted(outputs):
+                chunk_results, chunk_failed = outputs[chunk_idx]
+                for unique_id, prediction_df, actual_df in chunk_results:
+                    results[unique_id] = (prediction_df, actual_df)
+                    if forecast_cache is not None:
+                        forecast_cache.put(cache_keys[unique_id], (prediction_df, actual_df))
+                failed_unique_ids.extend(chunk_failed)
+
+            if forecast_cache is not None:
+                forecast_cache.evict()
+                logging.info(f"Forecast cache: {forecast_cache.hits} hits, {forecast_cache.misses} misses")
+                print(f"Forecast cache hits: {forecast_cache.hits}, misses: {forecast_cache.misses}")
+                metrics.increment('forecast_cache_hits', forecast_cache.hits)
+                metrics.increment('forecast_cache_misses', forecast_cache.misses)
+            metrics.increment('series_failed', len(failed_unique_ids))
+
+            # Merge the results in uniqueID order so the output does not depend on cache hits or worker scheduling
+            prediction_collector = ResultCollector()
+            actual_collector = ResultCollector()
+            for unique_id, _ in series:
+                if unique_id in results:
+                    prediction_df, actual_df = results[unique_id]
+                    prediction_collector.append(prediction_df)
+                    actual_collector.append(actual_df)
+
+            all_prediction_df = prediction_collector.to_frame()
+            all_actual_df = actual_collector.to_frame()
+            prediction_collector.clear()
+            actual_collector.clear()
 
             # Write failing unique IDs to a text file
             if failed_unique_ids:
                  logging.info("Writing failed unique IDs to failed_unique_ids_item_level.txt")
             #     # Check if file exists, and open in append mode if it does
-                 save_object(
+                 self.writer.submit(save_object,
                         file_path =self.model_training_config.failded_ids_path,
                         unique_ids_ = failed_unique_ids
                         )
@@ -174,8 +570,27 @@ class ModelTraining:
     def save_to_postgresql(self, df, table_name):
         
         try:   
-            engine = create_engine(self.model_training_config.db_url)
-            df.to_sql(table_name, engine, if_exists='replace', index=False)
+            from src.components.db_writer import PostgresWriter
+            config = self.model_training_config
+            db_writer = PostgresWriter(config.db_url or read_db_config(config.db_config_path))
+            table_columns = db_writer.table_columns(table_name) if config.db_write_mode == 'upsert' else None
+
+            with metrics.timer('db_write'):
+                if config.db_write_mode == 'upsert' and table_columns is not None and 'run_id' in table_columns:
+                    #### Only the series refitted in this run changed; upsert them keyed on (uniqueID, Booking_Date)
+                    changed_df = df if self.refit_unique_ids is None else df[df['uniqueID'].isin(self.refit_unique_ids)]
+                    db_writer.upsert(changed_df, table_name, config.db_key_columns, self.run_id,
+                                     prune_stale=config.prune_stale_forecasts)
+                    metrics.increment('db_rows_written', len(changed_df))
+                elif config.db_write_mode == 'upsert':
+                    # First upsert run: build the versioned table from the full frame
+                    db_writer.replace_table(df.assign(run_id=self.run_id), table_name, config.db_key_columns,
+                                            unique=True, run_column='run_id')
+                    metrics.increment('db_rows_written', len(df))
+                else:
+                    #### COPY into a staging table over a pooled connection, then swap it in atomically
+                    db_writer.replace_table(df, table_name, config.db_key_columns)
+                    metrics.increment('db_rows_written', len(df))
             logging.info(f"Data successfully saved to table {table_name} in PostgreSQL")
         except Exception as e:
             logging.error(f"Failed to save data to PostgreSQL: {e}")
@@ -185,17 +600,28 @@ class ModelTraining:
     def initiate_model_forecast(self,df_path,max_date):
         try:
             logging.info("Initiating Model Training")
-            df = pd.read_csv(df_path)
+            #### df_path is either the weekly artifact path or the weekly DataFrame itself
+            if isinstance(df_path, pd.DataFrame):
+                df = df_path[['uniqueID','Booking_Date','Gross_Amount']].copy()
+            else:
+                df = load_artifact(df_path, self.model_training_config.artifact_format, columns=['uniqueID','Booking_Date','Gross_Amount'])
             df['Booking_Date'] = pd.to_datetime(df['Booking_Date'])
             df['Gross_Amount'] = df['Gross_Amount'].astype('float64')
+            df['uniqueID'] = df['uniqueID'].astype('category')
             print(df.dtypes)
             print("model df columns",df.columns)
 
             prop1_all_prediction_df, prop1_all_actual_df = self.run_model_for_all_ids(self.model_,df,max_date,model_name="Prophet_model")
 
-            os.makedirs(os.path.dirname(self.model_training_config.forecasted_df_file_paths),exist_ok=True)
-            prop1_all_prediction_df.to_csv(self.model_training_config.forecasted_df_file_paths,index=False,header=True,encoding='latin1')
-            prop1_all_actual_df.to_csv(self.model_training_config.actual_df_file_paths,index=False,header=True,encoding='latin1')
+            #### Interval bounds go to their own artifact; forecasted_df and the predictions table keep their columns
+            interval_cols = [col for col in INTERVAL_COLUMNS if col in prop1_all_prediction_df.columns]
+            if interval_cols:
+                intervals_df = prop1_all_prediction_df[['uniqueID','Booking_Date','predicted'] + interval_cols]
+                prop1_all_prediction_df = prop1_all_prediction_df.drop(columns=interval_cols)
+                self.writer.submit(save_artifact, intervals_df, self.model_training_config.forecast_intervals_path, self.model_training_config.artifact_format)
+
+            self.writer.submit(save_artifact, prop1_all_prediction_df, self.model_training_config.forecasted_df_file_paths, self.model_training_config.artifact_format)
+            self.writer.submit(save_artifact, prop1_all_actual_df, self.model_training_config.actual_df_file_paths, self.model_training_config.artifact_format)
 
             logging.info(f'Successfully saved predictions into csv file.Predicted unique_IDS count: {prop1_all_prediction_df['uniqueID'].nunique()}')
 
@@ -0,0 +1,120 @@
+import os
+import sys
+import pickle
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+
+
+#### Stores opened by a worker process, reused across the chunks it is sent
+_OPEN_STORES = {}
+
+
+class SeriesStore:
+    '''
+    Weekly data partitioned once by uniqueID: every column is one contiguous NumPy array with the
+    rows of each series next to each other, and offsets[i]:offsets[i + 1] is the row range of
+    unique_ids[i]. Series keep their first-appearance order and their rows keep the frame's order,
+    like groupby(sort=False). frame(i) slices the arrays without copying; a saved store is opened
+    with np.load(mmap_mode='r') so worker processes share the pages instead of receiving pickled frames.
+    '''
+    def __init__(self, unique_ids, offsets, columns, id_col='uniqueID'):
+        self.unique_ids = unique_ids
+        self.offsets = offsets
+        self.columns = columns
+        self.id_col = id_col
+        self._positions = None
+
+    @classmethod
+    def from_frame(cls, df, id_col='uniqueID'):
+        try:
+            codes, unique_ids = pd.factorize(df[id_col], sort=False)
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes, minlength=len(unique_ids))
+            offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+            columns = {}
+            for column in df.columns:
+                if column != id_col:
+                    columns[column] = np.ascontiguousarray(df[column].to_numpy()[order])
+            #### The key column keeps its position; None marks it in the column order
+            columns = {column: columns.get(column) for column in df.columns}
+            return cls(np.asarray(unique_ids.astype(object)), offsets, columns, id_col)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def __len__(self):
+        return len(self.unique_ids)
+
+    def position(self, unique_id):
+        #### O(1) position of a uniqueID through a dict built on first use
+        if self._positions is None:
+            self._positions = {unique_id: i for i, unique_id in enumerate(self.unique_ids)}
+        return self._positions[unique_id]
+
+    def frame(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        data = {}
+        for column, values in self.columns.items():
+            if values is None:
+                data[column] = np.full(end - start, self.unique_ids[i], dtype=object)
+            else:
+                data[column] = values[start:end]
+        return pd.DataFrame(data, copy=False)
+
+    def items(self, positions=None):
+        #### (unique_id, DataFrame) pairs, for all series or for the given positions
+        positions = range(len(self)) if positions is None else positions
+        for i in positions:
+            yield self.unique_ids[i], self.frame(i)
+
+    def save(self, store_dir):
+        try:
+            os.makedirs(store_dir, exist_ok=True)
+            meta = {'unique_ids': self.unique_ids, 'columns': list(self.columns), 'id_col': self.id_col, 'dtypes': {}}
+            np.save(os.path.join(store_dir, 'offsets.npy'), self.offsets)
+            for j, (column, values) in enumerate(self.columns.items()):
+                if values is None:
+                    continue
+                meta['dtypes'][column] = values.dtype
+                if values.dtype.kind == 'M':
+                    values = values.view(np.int64)
+                np.save(os.path.join(store_dir, f'column_{j}.npy'), values, allow_pickle=values.dtype == object)
+            with open(os.path.join(store_dir, 'meta.pkl'), 'wb') as file_obj:
+                pickle.dump(meta, file_obj)
+            logging.info(f"Saved series store with {len(self)} series and {self.offsets[-1]} rows to {store_dir}")
+            return store_dir
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def open(cls, store_dir, mmap_mode='r'):
+        try:
+            with open(os.path.join(store_dir, 'meta.pkl'), 'rb') as file_obj:
+                meta = pickle.load(file_obj)
+            offsets = np.load(os.path.join(store_dir, 'offsets.npy'))
+            columns = {}
+            for j, column in enumerate(meta['columns']):
+                if column == meta['id_col']:
+                    columns[column] = None
+                    continue
+                dtype = meta['dtypes'][column]
+                if dtype == object:
+                    values = np.load(os.path.join(store_dir, f'column_{j}.npy'), allow_pickle=True)
+                else:
+                    values = np.load(os.path.join(store_dir, f'column_{j}.npy'), mmap_mode=mmap_mode)
+                columns[column] = values.view(dtype) if dtype.kind == 'M' else values
+            return cls(meta['unique_ids'], offsets, columns, meta['id_col'])
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def open_cached(cls, store_dir):
+        #### Used in worker processes: open (memory-map) the store once per process
+        if store_dir not in _OPEN_STORES:
+            _OPEN_STORES[store_dir] = cls.open(store_dir)
+        return _OPEN_STORES[store_dir]
@@ -4,15 +4,22 @@ from datetime import datetime
 
 LOG_FILE=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 logs_path=os.path.join(os.getcwd(),"logs",LOG_FILE)
-os.makedirs(logs_path,exist_ok=True)
 
 LOG_FILE_PATH=os.path.join(logs_path,LOG_FILE)
 
+
+class LazyFileHandler(logging.FileHandler):
+    #### The log directory and file are only created when the first record is written, not on import
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename),exist_ok=True)
+        return super()._open()
+
+
 logging.basicConfig(
-    filename=LOG_FILE_PATH,
+    handlers=[LazyFileHandler(LOG_FILE_PATH, delay=True)],
     format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
     level=logging.INFO,
 )
 
 if __name__=="__main__":
-    logging.info("logging has started")
\ No newline at end of file
+    logging.info("logging has started")
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from src.utils import peak_rss_mb
+
+
+METRICS_DIR = os.path.join('artifacts', 'metrics')
+METRIC_PREFIX = 'procurement_forecast'
+
+
+class Metrics:
+    '''
+    Process-wide run telemetry: named timers (total seconds and calls), counters, stages
+    (duration and peak RSS during the stage) and one record per uniqueID (fit/predict
+    latency, Stan iterations, ...). Worker processes hand what they recorded, and their own
+    peak RSS, back with pop_state() so the parent can merge_state() it. Exported as JSON per
+    run and as a Prometheus textfile holding the latest run.
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+        self.timers = {}
+        self.counters = {}
+        self.stages = {}
+        self.series = []
+        self.worker_peak_rss_mb = None    #### largest peak RSS reported by a pool worker since the current stage started
+        self._peak_before_reset = 0.0    #### process peak RSS recorded before the stages reset the high-water mark
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        timer['seconds'] += seconds
+        timer['calls'] += 1
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        rss_start = peak_rss_mb()
+        if rss_start is not None:
+            self._peak_before_reset = max(self._peak_before_reset, rss_start)
+        peak_reset = _reset_peak_rss()
+        self.worker_peak_rss_mb = None
+        try:
+            yield
+        finally:
+            #### With the high-water mark reset this is the peak of the stage itself; where it cannot be reset
+            #### the lifetime peak only belongs to this stage if the stage raised it, otherwise it is left out
+            stage_peak = peak_rss_mb()
+            if not peak_reset and stage_peak is not None and rss_start is not None and stage_peak <= rss_start:
+                stage_peak = None
+            #### peak_worker_rss_mb is measured inside the pool workers (None when the stage ran none),
+            #### other child processes such as CmdStan are not included
+            self.stages[name] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': stage_peak,
+                                 'peak_worker_rss_mb': self.worker_peak_rss_mb}
+
+    def process_peak_rss_mb(self):
+        #### Peak RSS of the whole run, including the stages before the high-water mark was last reset
+        peak = peak_rss_mb()
+        return None if peak is None else max(peak, self._peak_before_reset)
+
+    def observe_series(self, unique_id, **fields):
+        self.series.append(dict(uniqueID=unique_id, **fields))
+
+    def pop_state(self):
+        #### Timers, counters and series recorded by a worker process since its last pop, and its peak RSS
+        state = {'timers': self.timers, 'counters': self.counters, 'series': self.series, 'peak_rss_mb': peak_rss_mb()}
+        self.timers, self.counters, self.series = {}, {}, []
+        return state
+
+    def merge_state(self, state):
+        for name, timer in state['timers'].items():
+            merged = self.timers.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            merged['seconds'] += timer['seconds']
+            merged['calls'] += timer['calls']
+        for name, value in state['counters'].items():
+            self.increment(name, value)
+        self.series.extend(state['series'])
+        if state.get('peak_rss_mb') is not None:
+            self.worker_peak_rss_mb = max(self.worker_peak_rss_mb or 0.0, state['peak_rss_mb'])
+
+    def to_dict(self):
+        return {'run_id': self.run_id, 'peak_rss_mb': self.process_peak_rss_mb(), 'stages': self.stages,
+                'timers': self.timers, 'counters': self.counters, 'series': self.series}
+
+    def to_prometheus(self, slowest=10):
+        #### Aggregates only; the per-series records are kept out apart from the slowest fits to bound label cardinality
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {_number(value)}" if label_text else f"{METRIC_PREFIX}_{name} {_number(value)}")
+
+        metric('stage_seconds', 'Wall time of a pipeline stage.', [({'stage': name}, stage['seconds']) for name, stage in self.stages.items()])
+        metric('stage_peak_rss_megabytes', 'Peak RSS of the process during a pipeline stage (only stages that raised the peak where it cannot be reset).',
+               [({'stage': name}, stage['peak_rss_mb']) for name, stage in self.stages.items() if stage['peak_rss_mb'] is not None])
+        metric('stage_peak_worker_rss_megabytes', 'Largest peak RSS reported by a pool worker process during a pipeline stage.',
+               [({'stage': name}, stage['peak_worker_rss_mb']) for name, stage in self.stages.items() if stage['peak_worker_rss_mb'] is not None])
+        metric('step_seconds', 'Wall time spent in a pipeline step in this run.', [({'step': name}, timer['seconds']) for name, timer in self.timers.items()])
+        metric('step_calls', 'Number of times a pipeline step ran in this run.', [({'step': name}, timer['calls']) for name, timer in self.timers.items()])
+        metric('count', 'Pipeline counters.', [({'name': name}, value) for name, value in self.counters.items()])
+
+        fitted = [record for record in self.series if 'fit_seconds' in record]
+        metric('series_fitted', 'Series fitted in this run.', [({}, len(fitted))])
+        if fitted:
+            fit_seconds = sorted(record['fit_seconds'] for record in fitted)
+            metric('series_fit_seconds', 'Quantiles of the per-series fit time.',
+                   [({'quantile': str(q)}, fit_seconds[min(int(q * len(fit_seconds)), len(fit_seconds) - 1)]) for q in (0.5, 0.9, 0.99)]
+                   + [({'quantile': '1'}, fit_seconds[-1])])
+            iterations = [record['iterations'] for record in fitted if record.get('iterations') is not None]
+            if iterations:
+                metric('series_stan_iterations', 'Stan iterations summed over the fitted series.', [({}, sum(iterations))])
+            #### One sample per uniqueID, duplicate label sets are rejected by the textfile collector
+            slowest_fits = {}
+            for record in fitted:
+                slowest_fits[record['uniqueID']] = max(record['fit_seconds'], slowest_fits.get(record['uniqueID'], 0.0))
+            slowest_ids = sorted(slowest_fits, key=slowest_fits.get, reverse=True)[:slowest]
+            metric('slowest_series_fit_seconds', 'Fit time of the slowest series.',
+                   [({'uniqueID': unique_id}, slowest_fits[unique_id]) for unique_id in slowest_ids])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_dir=METRICS_DIR):
+        #### metrics_<run_id>.json keeps the history of every run; the node_exporter textfile collector reads
+        #### a single procurement_forecast.prom, replaced atomically so it never sees a partial file
+        os.makedirs(metrics_dir, exist_ok=True)
+        json_path = os.path.join(metrics_dir, f"metrics_{self.run_id}.json")
+        prom_path = os.path.join(metrics_dir, f"{METRIC_PREFIX}.prom")
+        with open(json_path, 'w') as file_obj:
+            json.dump(self.to_dict(), file_obj, indent=2, default=str)
+        tmp_path = f"{prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file_obj:
+            file_obj.write(self.to_prometheus())
+        os.replace(tmp_path, prom_path)
+        return json_path, prom_path
+
+
+def _reset_peak_rss():
+    #### Linux: writing 5 to clear_refs resets the peak RSS high-water mark, ru_maxrss follows it
+    try:
+        with open('/proc/self/clear_refs', 'w') as file_obj:
+            file_obj.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value))
+
+
+metrics = Metrics()
@@ -7,12 +7,13 @@ from src.components.data_ingestion import DataIngestion
 STAGE_NAME = "Data Ingestion stage"
 
 class DataIngestionPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, writer=None):
+        self.writer = writer
 
     def main(self):
-        data_ingestion=DataIngestion()
-        data_ingestion.initiate_data_ingestion()
+        data_ingestion=DataIngestion(writer=self.writer)
+        final_data, category_data = data_ingestion.initiate_data_ingestion()
+        return final_data, category_data
 
 
 
@@ -6,19 +6,20 @@ from src.components.data_transformation import DataTransformation
 STAGE_NAME = "Data Transformation stage"
 
 class DataTransformationPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, writer=None):
+        self.writer = writer
 
-    def main(self):
+    def main(self, final_data=None):
+        #### final_data is the ingestion DataFrame when the stages are chained in memory
         final_data_path = 'artifacts/data_ingestion/final_data.csv'  # Replace with the actual path to your final data file
-        data_transform = DataTransformation()
-        data_transform.data_preprocessor(final_data_path)
+        data_transform = DataTransformation(writer=self.writer)
+        return data_transform.data_preprocessor(final_data if final_data is not None else final_data_path)
 
 
 if __name__ == '__main__':
     try:
         logging.info(f">>>>>>>>> stage {STAGE_NAME} started  <<<<<<<<<<")
-        obj = DataTransformationPipeline
+        obj = DataTransformationPipeline()
         obj.main()
         logging.info(f">>>>>>>>> stage {STAGE_NAME} completed  <<<<<<<<<<")
 
@@ -3,6 +3,8 @@ import sys
 import numpy as np 
 import pandas as pd
 import pickle
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 from src.exception import CustomException
 
 
@@ -35,27 +37,278 @@ def load_object(file_path):
 
     except Exception as e:
         raise CustomException(e, sys)
+
+
+class ResultCollector:
+    '''
+    Collects per-series DataFrames and materializes them with a single concat,
+    instead of concatenating the growing frame once per series.
+    '''
+    def __init__(self):
+        self._frames = []
+        self.n_rows = 0
+
+    def append(self, df):
+        try:
+            if df is None or df.empty:
+                return
+            self._frames.append(df)
+            self.n_rows += len(df)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def to_frame(self, ignore_index=True):
+        try:
+            if not self._frames:
+                return pd.DataFrame()
+            return pd.concat(self._frames, ignore_index=ignore_index)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def clear(self):
+        self._frames = []
+        self.n_rows = 0
     
 
-# def read_yaml(path_to_yaml_path):
-#     try:
-#         with open(path_to_yaml_path) as yaml_file:
-#             content = yaml.safe_load(yaml_file)
-#             return content
+def read_yaml(path_to_yaml_path):
+    try:
+        with open(path_to_yaml_path) as yaml_file:
+            content = yaml.safe_load(yaml_file)
+            return content
         
-#     except Exception as e:
-#         raise CustomException(e, sys)
+    except Exception as e:
+        raise CustomException(e, sys)
     
 
-# def read_db_config(config_file_path):
-#     try:
-#         with open(config_file_path, 'r') as file:
-#             config = yaml.safe_load(file)
-#         db_config = config['db']
-#         db_url = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
-#         return db_url
+def read_db_config(config_file_path):
+    try:
+        with open(config_file_path, 'r') as file:
+            config = yaml.safe_load(file)
+        db_config = config['db']
+        db_url = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+        return db_url
     
-#     except Exception as e:
-#         raise CustomException(e, sys)
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+SOURCE_DEFAULTS = {'type': 'csv', 'table': None, 'date_from': None, 'date_to': None, 'batch_size': 100000}
+
+
+def read_source_config(config_file_path='config/config.yaml'):
+    #### Ingestion source from the 'source' section of the config, the CSV export when the file or the section is missing
+    if not os.path.exists(config_file_path):
+        return dict(SOURCE_DEFAULTS)
+    config = read_yaml(config_file_path) or {}
+    source_config = dict(SOURCE_DEFAULTS, **(config.get('source') or {}))
+    if source_config['type'] not in ('csv', 'postgres'):
+        raise CustomException(f"Unsupported ingestion source: {source_config['type']}", sys)
+    return source_config
+
+
+
+def _strip_lower(series, lower):
+    stripped = series.str.strip()
+    #### .str.strip returns NaN for numbers but also strips bytes, so put every non-str cell back from the original column
+    stripped = stripped.where(series.map(type).eq(str), series)
+    return stripped.str.lower() if lower else stripped
+
+
+def clean_string_columns(df, lower=(), as_str=()):
+    '''
+    Column-wise replacement for applymap(lambda x: x.strip() if isinstance(x, str) else x).
+    Only object/string columns are touched and non-string cells (NaN, numbers) are left as they are.
+    Columns in lower are also lowercased (non-strings become NaN, as with .str.lower()) and
+    columns in as_str are cast with astype(str), all in the same pass over each column.
+    '''
+    try:
+        df = df.copy()
+        for column in df.columns:
+            series = df[column]
+            if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                inferred = pd.api.types.infer_dtype(series, skipna=True)
+                if inferred not in ('string', 'empty', 'mixed', 'mixed-integer') and column not in lower:
+                    pass    #### no strings in the column, nothing to strip
+                elif inferred == 'string':
+                    #### Pure text columns repeat a few thousand distinct values, so clean the uniques and scatter back
+                    codes, uniques = pd.factorize(series)
+                    cleaned = _strip_lower(pd.Series(uniques, dtype=object), column in lower).to_numpy(dtype=object)
+                    values = cleaned.take(codes)
+                    missing = codes == -1
+                    values[missing] = series.to_numpy(dtype=object)[missing]
+                    series = pd.Series(values, index=series.index, name=column)
+                else:
+                    series = _strip_lower(series, column in lower)
+            if column in as_str:
+                series = series.astype(str)
+            df[column] = series
+        return df
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+ARTIFACT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+
+def read_artifact_format(config_file_path='config/config.yaml'):
+    #### Artifact format from the 'artifacts' section of the config, csv when the file or the section is missing
+    if not os.path.exists(config_file_path):
+        return 'csv'
+    config = read_yaml(config_file_path) or {}
+    artifact_format = (config.get('artifacts') or {}).get('format', 'csv')
+    if artifact_format not in ARTIFACT_EXTENSIONS:
+        raise CustomException(f"Unsupported artifact format: {artifact_format}", sys)
+    return artifact_format
+
+
+def read_incremental_mode(config_file_path='config/config.yaml'):
+    #### transformation.incremental from the config, off when the file or the section is missing
+    if not os.path.exists(config_file_path):
+        return False
+    config = read_yaml(config_file_path) or {}
+    return bool((config.get('transformation') or {}).get('incremental', False))
+
+
+def artifact_path(file_path, artifact_format='csv'):
+    #### Swap the extension of a configured artifact path to match the artifact format
+    return os.path.splitext(file_path)[0] + ARTIFACT_EXTENSIONS[artifact_format]
+
+
+def save_artifact(df, file_path, artifact_format='csv', encoding='latin1'):
+    try:
+        file_path = artifact_path(file_path, artifact_format)
+        dir_path = os.path.dirname(file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        if artifact_format == 'csv':
+            df.to_csv(file_path, index=False, header=True, encoding=encoding)
+        elif artifact_format == 'parquet':
+            #### Categorical keys are stored dictionary-encoded and datetimes as native timestamps
+            df.to_parquet(file_path, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(file_path)
+        return file_path
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_artifact(file_path, artifact_format='csv', columns=None, unique_ids=None, unique_id_col='uniqueID', encoding='latin1'):
+    '''
+    Load a stage artifact. columns projects the read and unique_ids keeps only those series;
+    for parquet/feather both are pushed down into the Arrow scan so other row groups are never decoded.
+    '''
+    try:
+        file_path = artifact_path(file_path, artifact_format)
+        if artifact_format == 'csv':
+            df = pd.read_csv(file_path, encoding=encoding, usecols=columns, float_precision='round_trip')
+            if unique_ids is not None:
+                df = df[df[unique_id_col].isin(list(unique_ids))].reset_index(drop=True)
+            return df
+
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(file_path, format='parquet' if artifact_format == 'parquet' else 'ipc')
+        row_filter = ds.field(unique_id_col).isin(list(unique_ids)) if unique_ids is not None else None
+        return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+class ArtifactAppender:
+    '''
+    Writes an artifact one chunk at a time so it never has to be held in memory in full.
+    CSV chunks are appended after a single header, parquet chunks become row groups and
+    feather chunks record batches of one Arrow IPC file. All chunks must share the first chunk's columns.
+    '''
+    def __init__(self, file_path, artifact_format='csv', encoding='latin1'):
+        self.file_path = artifact_path(file_path, artifact_format)
+        self.artifact_format = artifact_format
+        self.encoding = encoding
+        self.n_rows = 0
+        self._schema = None
+        self._writer = None
+        dir_path = os.path.dirname(self.file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+    def write(self, df):
+        try:
+            if self.artifact_format == 'csv':
+                df.to_csv(self.file_path, index=False, header=self.n_rows == 0, mode='w' if self.n_rows == 0 else 'a', encoding=self.encoding)
+            else:
+                import pyarrow as pa
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+                if self._writer is None:
+                    self._schema = table.schema
+                    if self.artifact_format == 'parquet':
+                        import pyarrow.parquet as pq
+                        self._writer = pq.ParquetWriter(self.file_path, self._schema)
+                    else:
+                        self._writer = pa.ipc.new_file(self.file_path, self._schema)
+                self._writer.write_table(table)
+            self.n_rows += len(df)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return self.file_path
+
+
+def peak_rss_mb():
+    #### Peak resident set size of this process in MB
+    #### (ru_maxrss is KB on Linux, bytes on macOS); None where unavailable
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class ArtifactWriter:
+    '''
+    Persists stage artifacts. With background=True the writes run on a single writer thread
+    so the next stage can start straight away; enabled=False skips persistence altogether.
+    Frames handed to submit must not be mutated afterwards.
+    '''
+    def __init__(self, background=False, enabled=True):
+        self.background = background
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifact-writer') if background and enabled else None
+        self._futures = []
+
+    def __getstate__(self):
+        #### Pool workers receive the trainer (and so its writer) pickled with the bound model method;
+        #### the writer thread stays in the parent and a copy in a worker writes inline
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_futures'] = []
+        return state
 
+    def submit(self, func, *args, **kwargs):
+        if not self.enabled:
+            return None
+        if self._executor is None:
+            return func(*args, **kwargs)
+        self._futures.append(self._executor.submit(func, *args, **kwargs))
 
+    def close(self):
+        #### Wait for the pending writes and surface the first error
+        if self._executor is None:
+            return
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures = []
+            self._executor.shutdown(wait=True)
+            self._executor = None